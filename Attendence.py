@@ -1,79 +1,148 @@
+import profiling
+import metrics
 import streamlit as st
 import pandas as pd
-import os
 from datetime import date
 
+from attendance_store import (
+    init_store,
+    mark_attendance,
+    mark_attendance_bulk,
+    get_student_attendance,
+    get_attendance_summary,
+    get_shortage_list,
+    read_bulk_upload,
+    memory_report,
+    start_compaction,
+    SHORTAGE_THRESHOLD,
+    WriteQueueFull,
+)
+from roster import authenticate, authenticate_faculty
+
 # ---------------- CONFIG ----------------
 st.set_page_config(
     page_title="CITY College Attendance System",
     page_icon="📘",
     layout="centered"
 )
-
-ATTENDANCE_FILE = "attendance.csv"
-
-# Hardcoded students (RollNo : Password)
-STUDENTS = {
-    "101": "city101",
-    "102": "city102",
-    "103": "city103"
-}
-
-# ---------------- FUNCTIONS ----------------
-def init_csv():
-    if not os.path.exists(ATTENDANCE_FILE):
-        df = pd.DataFrame(columns=["RollNo", "Date", "Status"])
-        df.to_csv(ATTENDANCE_FILE, index=False)
-
-def authenticate(roll, password):
-    return roll in STUDENTS and STUDENTS[roll] == password
-
-def mark_attendance(roll, selected_date, status):
-    df = pd.read_csv(ATTENDANCE_FILE)
-
-    # Check duplicate entry
-    if ((df["RollNo"] == roll) & (df["Date"] == str(selected_date))).any():
-        return False
-
-    new_entry = {
-        "RollNo": roll,
-        "Date": str(selected_date),
-        "Status": status
-    }
-
-    df = pd.concat([df, pd.DataFrame([new_entry])], ignore_index=True)
-    df.to_csv(ATTENDANCE_FILE, index=False)
-    return True
-
-def get_student_attendance(roll):
-    df = pd.read_csv(ATTENDANCE_FILE)
-    return df[df["RollNo"] == roll]
+profiling.start_rerun()
 
 # ---------------- INIT ----------------
-init_csv()
+init_store()
+start_compaction()
 
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
+    st.session_state.faculty = False
+
+profiling.checkpoint("init")
 
 # ---------------- UI ----------------
 st.title("📘 CITY College Attendance Management System")
 
 # ---------- LOGIN PAGE ----------
 if not st.session_state.logged_in:
-    st.subheader("🔐 Student Login")
-
-    roll = st.text_input("Roll Number")
+    login_as = st.radio("Login as", ["Student", "Faculty"], horizontal=True)
+
+    if login_as == "Student":
+        st.subheader("🔐 Student Login")
+        roll = st.text_input("Roll Number")
+    else:
+        st.subheader("🔐 Faculty Login")
+        roll = st.text_input("Username")
     password = st.text_input("Password", type="password")
 
     if st.button("Login"):
-        if authenticate(roll, password):
+        if login_as == "Student" and authenticate(roll, password):
+            st.session_state.logged_in = True
+            st.session_state.faculty = False
+            st.session_state.roll = roll
+            st.success("Login successful ✅")
+            st.rerun()
+        elif login_as == "Faculty" and authenticate_faculty(roll, password):
             st.session_state.logged_in = True
+            st.session_state.faculty = True
             st.session_state.roll = roll
             st.success("Login successful ✅")
             st.rerun()
+        elif login_as == "Faculty":
+            st.error("Invalid Username or Password ❌")
         else:
             st.error("Invalid Roll Number or Password ❌")
 
+# ---------- FACULTY: MARK WHOLE CLASS ----------
+elif st.session_state.faculty:
+    st.success(f"Welcome Faculty: {st.session_state.roll}")
+    st.subheader("🏫 Mark Whole Class")
+
+    mode = st.radio("Input", ["Roll number list", "Upload CSV"], horizontal=True)
+
+    rows = None
+    if mode == "Roll number list":
+        class_date = st.date_input(
+            "Select Date",
+            value=date.today(),
+            max_value=date.today()
+        )
+        class_status = st.radio("Attendance Status", ["Present", "Absent"])
+        rolls_text = st.text_area("Roll Numbers (one per line or comma separated)")
+
+        if st.button("Submit Class Attendance"):
+            rolls = [r.strip() for r in rolls_text.replace(",", "\n").splitlines() if r.strip()]
+            rows = pd.DataFrame({
+                "RollNo": rolls,
+                "Date": str(class_date),
+                "Status": class_status
+            })
+    else:
+        uploaded = st.file_uploader("CSV with RollNo, Date (YYYY-MM-DD), Status columns", type=["csv"])
+
+        if uploaded is not None and st.button("Submit Class Attendance"):
+            try:
+                rows = read_bulk_upload(uploaded)
+            except ValueError as e:
+                st.error(str(e))
+
+    if rows is not None:
+        if rows.empty:
+            st.warning("No roll numbers to mark ⚠")
+        else:
+            accepted, rejected = mark_attendance_bulk(rows)
+            st.success(f"Attendance marked for {len(accepted)} of {len(rows)} rows ✅")
+            if not rejected.empty:
+                st.warning(f"{len(rejected)} rows were rejected ⚠")
+                st.dataframe(rejected, use_container_width=True)
+
+    st.divider()
+    st.subheader("📉 Attendance Shortage")
+
+    summary_month = st.date_input("Month", value=date.today(), max_value=date.today())
+    threshold = st.slider("Minimum Attendance %", 0, 100, SHORTAGE_THRESHOLD)
+    shortage = get_shortage_list(summary_month.strftime("%Y-%m"), threshold)
+
+    if shortage.empty:
+        st.success("No students below the threshold ✅")
+    else:
+        st.dataframe(shortage, use_container_width=True, hide_index=True)
+
+    with st.expander("💾 Attendance Data Footprint"):
+        if st.button("Measure memory usage"):
+            report = memory_report()
+            st.dataframe(report, use_container_width=True)
+            total = report.loc["Total"]
+            st.caption(
+                f"Compact load uses {total['Compact (bytes)'] / max(total['Default (bytes)'], 1):.0%} "
+                "of the default pandas load"
+            )
+
+    st.divider()
+
+    if st.button("Logout"):
+        st.session_state.logged_in = False
+        st.session_state.faculty = False
+        st.session_state.roll = None
+        st.rerun()
+
 # ---------- DASHBOARD ----------
 else:
     st.success(f"Welcome Student Roll No: {st.session_state.roll}")
@@ -91,14 +160,19 @@ else:
         status = st.radio("Attendance Status", ["Present", "Absent"])
 
         if st.button("Submit Attendance"):
-            success = mark_attendance(
-                st.session_state.roll,
-                selected_date,
-                status
-            )
+            try:
+                success = mark_attendance(
+                    st.session_state.roll,
+                    selected_date,
+                    status
+                )
+            except WriteQueueFull:
+                success = None
 
             if success:
                 st.success("Attendance marked successfully ✅")
+            elif success is None:
+                st.error("Server is busy, please submit again ❌")
             else:
                 st.warning("Attendance already marked for this date ⚠")
 
@@ -107,6 +181,14 @@ else:
         student_data = get_student_attendance(st.session_state.roll)
         st.dataframe(student_data, use_container_width=True)
 
+    st.subheader("📈 Monthly Summary")
+    summary = get_attendance_summary(roll=st.session_state.roll)
+    st.dataframe(
+        summary[["Month", "Present", "Absent", "Total", "Percent"]],
+        use_container_width=True,
+        hide_index=True
+    )
+
     st.divider()
 
     if st.button("Logout"):
@@ -114,8 +196,13 @@ else:
         st.session_state.roll = None
         st.rerun()
 
+profiling.checkpoint("page")
+
 # ---------------- FOOTER ----------------
 st.markdown(
     "<center>© CITY College | Attendance Management System</center>",
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+profiling.render_report()
+metrics.export("attendance")
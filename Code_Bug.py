@@ -1,9 +1,8 @@
+import profiling
+import metrics
 import streamlit as st
 import ast
 import re
-from radon.complexity import cc_visit
-from radon.metrics import mi_visit
-from radon.raw import analyze
 import tempfile
 import subprocess
 import sys
@@ -14,6 +13,7 @@ from typing import Tuple
 # Helper Functions
 # -----------------------------
 
+@metrics.timed("code_review.python_issues")
 def detect_python_issues(code: str):
     issues = []
     try:
@@ -29,6 +29,7 @@ def detect_python_issues(code: str):
     return issues
 
 
+@metrics.timed("code_review.java_issues")
 def detect_java_issues(code: str):
     issues = []
     if re.search(r"System\.out\.println", code):
@@ -40,19 +41,26 @@ def detect_java_issues(code: str):
     return issues
 
 
+@metrics.timed("code_review.complexity")
 def complexity_analysis(code: str, language: str):
     if language == "Python":
+        # radon is only needed once a Python file has been uploaded
+        from radon.complexity import cc_visit
         blocks = cc_visit(code)
         return [(b.name, b.complexity) for b in blocks]
     return []
 
 
+@metrics.timed("code_review.quality_score")
 def quality_score(code: str):
+    # Imported outside the try: a missing radon is an error, not a score of 0
+    from radon.metrics import mi_visit
     try:
         mi = mi_visit(code, True)
-        return round(mi, 2)
-    except:
+    except Exception:
+        # Code radon cannot parse gets the lowest score
         return 0.0
+    return round(mi, 2)
 
 
 def refactoring_suggestions(language: str):
@@ -82,6 +90,7 @@ def explain_issues_nl(issues, language):
     return explanations
 
 
+@metrics.timed("code_review.runtime_errors")
 def runtime_error_detection(code, language):
     errors = []
     if language == "Python":
@@ -97,6 +106,7 @@ def runtime_error_detection(code, language):
     return errors
 
 
+@metrics.timed("code_review.run_python")
 def run_python_realtime(code: str, timeout: int = 5) -> Tuple[int, str, str]:
     """Run Python code in a temporary file using the current interpreter.
     Returns (returncode, stdout, stderr). Uses a short timeout to avoid hangs.
@@ -139,6 +149,7 @@ def explain_runtime_error(output: str, language: str):
         return f"Runtime/compile message: {last}"
 
 
+@metrics.timed("code_review.run_java")
 def run_java_realtime(code: str, timeout: int = 10) -> Tuple[int, str, str]:
     """Compile and run Java code in a temporary directory.
     Returns (returncode, stdout, stderr). If javac/java not found, return code -3.
@@ -207,6 +218,7 @@ def explain_java_error(stderr: str):
 # -----------------------------
 
 st.set_page_config(page_title="AI Code Review Tool", layout="wide")
+profiling.start_rerun()
 
 st.title("🤖 AI Code Review & Bug Detection Tool")
 st.write("Upload your code to analyze bugs, complexity, and quality.")
@@ -243,6 +255,7 @@ if uploaded_file:
             st.write(f"Function: {name} | Cyclomatic Complexity: {c}")
     else:
         st.info("Complexity analysis not available for this language")
+    profiling.checkpoint("static analysis")
 
     st.subheader("🔧 Refactoring Suggestions")
     for s in refactoring_suggestions(language):
@@ -264,6 +277,8 @@ if uploaded_file:
     else:
         st.success("No immediate runtime or compilation errors detected.")
 
+    profiling.checkpoint("explanations & runtime checks")
+
     st.subheader("⚡ Realtime Execution")
     if language == "Python":
         if st.button("Run Uploaded Python Code"):
@@ -310,3 +325,7 @@ if uploaded_file:
 
 else:
     st.warning("Please upload a code file to begin analysis.")
+
+profiling.checkpoint("execution & footer")
+profiling.render_report()
+metrics.export("code_review")
@@ -1,18 +1,26 @@
 # app.py
+import profiling
+import metrics
 import streamlit as st
+import importlib.util
 import os
-import glob
-import time
 import shutil
-import threading
-from queue import Queue, Empty
 import subprocess
 import sys
 
+from downloader import (
+    DOWNLOAD_WORKERS,
+    ERROR,
+    FINISHED,
+    FORMATS,
+    INTERRUPTED,
+    DownloadQueue,
+    build_options,
+)
+
 # Ensure yt-dlp is available; if not, offer an in-app installer and stop.
-try:
-    from yt_dlp import YoutubeDL
-except Exception:
+# Only look it up here: importing it is deferred until a download runs.
+if importlib.util.find_spec("yt_dlp") is None:
     st.error("The 'yt-dlp' package is not installed in this Python environment.")
     if st.button("Install yt-dlp into this environment"):
         with st.spinner("Installing yt-dlp..."):
@@ -23,35 +31,19 @@ except Exception:
                 st.error(f"Installation failed:\n{proc.stderr}")
     st.stop()
 
-# Ensure download folder exists (use absolute path based on this file)
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-
 st.set_page_config(page_title="YouTube Downloader", layout="centered")
+profiling.start_rerun()
 st.title("YouTube Video/Audio Downloader (Streamlit)")
 
-st.write("Paste a YouTube URL, choose format, then click **Download**. "
+st.write("Paste one or more YouTube URLs (one per line), choose format, then click **Download**. "
          "Only download videos you have rights to.")
 
-url = st.text_input("YouTube video URL")
-choice = st.selectbox("Format", options=["best (video+audio)", "mp4 (video)", "mp3 (audio only)"])
-filename_placeholder = st.empty()
-progress_placeholder = st.empty()
-
-def find_latest_file_with_title(title):
-    # search downloads folder for files that contain title in name
-    pattern = os.path.join(DOWNLOAD_DIR, f"*{sanitize_filename(title)}*")
-    files = glob.glob(pattern)
-    if not files:
-        return None
-    # return most recently modified
-    files.sort(key=os.path.getmtime, reverse=True)
-    return files[0]
+# Longest wait for a progress notification before checking for a rerun
+PROGRESS_WAIT_SECONDS = 1.0
+LIBRARY_PAGE_SIZE = 20
 
-def sanitize_filename(name):
-    # very small sanitizer to avoid problematic chars for glob matching
-    return "".join(c for c in name if c.isalnum() or c in (" ", "-", "_")).rstrip()
+urls_text = st.text_area("YouTube video URLs")
+choice = st.selectbox("Format", options=FORMATS)
 
 
 def adjust_opts_for_ffmpeg(opts, choice):
@@ -80,171 +72,113 @@ def adjust_opts_for_ffmpeg(opts, choice):
 
     return opts
 
-def download_with_hook(url, opts, events_q: Queue = None, result_q: Queue = None):
-    # progress hook closure that pushes events to a queue (thread-safe)
-    def progress_hook(d):
-        if events_q is not None:
-            events_q.put(d)
-        else:
-            # fallback to previous direct UI updates (rare)
-            status = d.get("status")
-            if status == "downloading":
-                total = d.get("total_bytes") or d.get("total_bytes_estimate")
-                downloaded = d.get("downloaded_bytes", 0)
-                if total:
-                    pct = downloaded / total * 100
-                    progress_placeholder.progress(min(int(pct), 100))
-                    filename_placeholder.text(f"Downloading... {d.get('filename','')}\n{int(pct)}%")
-                else:
-                    filename_placeholder.text(f"Downloading... {d.get('filename','')}")
-            elif status == "finished":
-                progress_placeholder.progress(100)
-                filename_placeholder.text("Download finished. Finalizing...")
-            elif status == "error":
-                filename_placeholder.text("Error during download.")
-
-    opts["progress_hooks"] = [progress_hook]
-
-    try:
-        with YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-        if result_q is not None:
-            result_q.put({"status": "finished", "info": info})
-        return info
-    except Exception as e:
-        if result_q is not None:
-            result_q.put({"status": "error", "error": str(e)})
-        return None
+
+@st.cache_resource
+def get_download_queue():
+    # One queue for the whole server process: it owns the worker threads,
+    # so reruns and other sessions see the same jobs, and it replays the
+    # job journal when the server starts.
+    return DownloadQueue()
+
+
+download_queue = get_download_queue()
+
+profiling.checkpoint("setup")
 
 if st.button("Download"):
-    if not url.strip():
+    # one URL per line, blank lines and repeats ignored
+    urls = list(dict.fromkeys(u.strip() for u in urls_text.splitlines() if u.strip()))
+    if not urls:
         st.error("Please paste a YouTube URL.")
     else:
-        progress_placeholder.empty()
-        filename_placeholder.empty()
-        # set options depending on choice
-        if choice == "best (video+audio)":
-            ydl_opts = {
-                "format": "bestvideo+bestaudio/best",
-                "outtmpl": os.path.join(DOWNLOAD_DIR, "%(title)s.%(ext)s"),
-                "noplaylist": True,
-                "quiet": True,
-                "no_warnings": True,
-            }
-        elif choice == "mp4 (video)":
-            ydl_opts = {
-                "format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/mp4",
-                "outtmpl": os.path.join(DOWNLOAD_DIR, "%(title)s.%(ext)s"),
-                "noplaylist": True,
-                "quiet": True,
-                "no_warnings": True,
-            }
-        else:  # mp3
-            ydl_opts = {
-                "format": "bestaudio/best",
-                "outtmpl": os.path.join(DOWNLOAD_DIR, "%(title)s.%(ext)s"),
-                "noplaylist": True,
-                "quiet": True,
-                "no_warnings": True,
-                "postprocessors": [
-                    {
-                        "key": "FFmpegExtractAudio",
-                        "preferredcodec": "mp3",
-                        "preferredquality": "192",
-                    }
-                ],
-            }
-
-        # ensure filenames are safe and adapt options if ffmpeg missing
-        ydl_opts["restrictfilenames"] = True
-        ydl_opts = adjust_opts_for_ffmpeg(ydl_opts, choice)
-
-        # start background download using queues for progress and result
-        events_q = Queue()
-        result_q = Queue()
-        download_thread = threading.Thread(target=download_with_hook, args=(url, ydl_opts, events_q, result_q), daemon=True)
-        download_thread.start()
-
-        st.info("Download started in background...")
-
-        # poll for progress events while the background thread runs
-        while download_thread.is_alive() or not result_q.empty():
-            try:
-                # drain events queue
-                while True:
-                    ev = events_q.get_nowait()
-                    status = ev.get("status")
-                    if status == "downloading":
-                        total = ev.get("total_bytes") or ev.get("total_bytes_estimate")
-                        downloaded = ev.get("downloaded_bytes", 0)
-                        if total:
-                            pct = int(min(downloaded / total * 100, 100))
-                            progress_placeholder.progress(pct)
-                            filename_placeholder.text(f"Downloading... {ev.get('filename','')}\n{pct}%")
-                        else:
-                            filename_placeholder.text(f"Downloading... {ev.get('filename','')}")
-                    elif status == "finished":
-                        progress_placeholder.progress(100)
-                        filename_placeholder.text("Download finished. Finalizing...")
-                    elif status == "error":
-                        filename_placeholder.text("Error during download.")
-            except Empty:
-                pass
-            time.sleep(0.1)
-
-        # get final result
-        result = None
-        try:
-            result = result_q.get_nowait()
-        except Empty:
-            result = None
-
-        if result is None:
-            st.error("Download failed or was interrupted.")
-            st.stop()
-
-        if result.get("status") == "error":
-            st.error(f"Download failed: {result.get('error')}")
-            st.stop()
-
-        info = result.get("info")
-        st.success("Download completed — searching for downloaded file...")
-        # try to find the most recent file in downloads (with some retry for postprocessing)
-        time.sleep(0.5)
-        # extract basic info to find filename (safer to glob by title)
-        try:
-            # re-run a small info extraction without downloading to get title
-            with YoutubeDL({"quiet": True, "no_warnings": True, "skip_download": True}) as ydl:
-                info = ydl.extract_info(url, download=False)
-            title = info.get("title", "")
-        except Exception:
-            title = ""
-
-        # try to compute expected filename from returned info
-        downloaded_file = None
-        try:
-            with YoutubeDL({"outtmpl": os.path.join(DOWNLOAD_DIR, "%(title)s.%(ext)s"), "quiet": True}) as ydl:
-                expected = ydl.prepare_filename(info)
-            if expected and os.path.exists(expected):
-                downloaded_file = expected
-        except Exception:
-            downloaded_file = None
-
-        # fallback: find by title (fallback to most recent file if title empty)
-        if not downloaded_file and title:
-            downloaded_file = find_latest_file_with_title(title)
-        if not downloaded_file:
-            files = glob.glob(os.path.join(DOWNLOAD_DIR, "*"))
-            if files:
-                files.sort(key=os.path.getmtime, reverse=True)
-                downloaded_file = files[0]
-
-        if downloaded_file and os.path.exists(downloaded_file):
-            st.write(f"**Saved file:** `{os.path.basename(downloaded_file)}`")
-            # show file size
-            st.write(f"Size: {round(os.path.getsize(downloaded_file) / (1024*1024), 2)} MB")
-            # present download button to user
-            with open(downloaded_file, "rb") as f:
-                st.download_button("Download file to your computer", data=f, file_name=os.path.basename(downloaded_file))
-        else:
-            st.error("Could not find the downloaded file. Check the downloads folder.")
+        ydl_opts = adjust_opts_for_ffmpeg(build_options(choice, download_queue.download_dir), choice)
+        for u in urls:
+            download_queue.submit(u, choice, ydl_opts)
+        st.info(f"{len(urls)} download(s) queued — up to {DOWNLOAD_WORKERS} run at a time.")
+
+
+def draw_progress(slot, job):
+    pct = job.percent()
+    slot.progress(pct or 0, text=f"{job.status.capitalize()}" + (f" — {pct}%" if pct is not None else ""))
+
+
+# Progress bars of running jobs, redrawn in place as notifications arrive
+progress_slots = {}
+progress_version = download_queue.progress.version
+jobs = download_queue.jobs()
+finished = []
+if jobs:
+    st.subheader("Downloads")
+    for job in reversed(jobs):
+        with st.container():
+            st.write(f"**{job.filename or job.url}** — {job.choice}" + (" (already downloaded)" if job.cached else ""))
+            # the manifest knows each finished job's file; no directory search
+            entry = download_queue.manifest.get(job.id) if job.status == FINISHED else None
+            if entry is not None and os.path.exists(entry["path"]):
+                st.write(f"**Saved file:** `{entry['name']}`")
+                # show file size
+                st.write(f"Size: {round(entry['size'] / (1024*1024), 2)} MB")
+                finished.append(entry)
+            elif job.status == FINISHED:
+                st.error("The downloaded file is no longer in the downloads folder.")
+            elif job.status in (ERROR, INTERRUPTED):
+                if job.status == ERROR:
+                    st.error(f"Download failed: {job.error}")
+                else:
+                    st.warning("Interrupted by a server restart.")
+                if st.button("Retry", key=f"retry-{job.id}"):
+                    download_queue.retry(job.id)
+                    st.rerun()
+            else:
+                progress_slots[job.id] = st.empty()
+                draw_progress(progress_slots[job.id], job)
+
+    # One download button for the picked job: Streamlit reads the whole
+    # file into memory for every button it renders, on every rerun.
+    if finished:
+        picked_job = st.selectbox("Finished download", finished, format_func=lambda e: e["name"])
+        with open(picked_job["path"], "rb") as f:
+            st.download_button("Download file to your computer", data=f, file_name=picked_job["name"])
+
+    if st.button("Clear finished"):
+        download_queue.clear_finished()
+        st.rerun()
+
+# Library: every saved file, paged from the manifest
+saved_count = len(download_queue.manifest)
+if saved_count:
+    st.subheader("Library")
+    page_count = max(-(-saved_count // LIBRARY_PAGE_SIZE), 1)
+    page_no = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    library = download_queue.manifest.page(page_no - 1, LIBRARY_PAGE_SIZE)
+    st.dataframe(
+        {
+            "File": [e["name"] for e in library],
+            "Title": [e["title"] for e in library],
+            "Size (MB)": [round(e["size"] / (1024*1024), 2) for e in library],
+            "SHA-256": [e["sha256"][:16] for e in library],
+        },
+        hide_index=True,
+    )
+    st.caption(f"Page {page_no} of {page_count} — {saved_count} files")
+
+    picked = st.selectbox("File", library, format_func=lambda e: e["name"])
+    if picked is not None and os.path.exists(picked["path"]):
+        with open(picked["path"], "rb") as f:
+            st.download_button("Download selected file", data=f, file_name=picked["name"])
+
+profiling.checkpoint("download")
+profiling.render_report()
+metrics.export("downloader")
+
+# Follow running jobs until one finishes or another starts, then rerun so
+# the finished job gets its download button. The script sleeps on the
+# notifier between (rate-limited) updates; the timeout only bounds how
+# long a widget interaction waits for this run to stop.
+while progress_slots:
+    progress_version = download_queue.progress.wait(progress_version, timeout=PROGRESS_WAIT_SECONDS)
+    current = {job.id: job for job in download_queue.jobs()}
+    if {k for k, job in current.items() if not job.done} != set(progress_slots):
+        st.rerun()
+    for job_id, slot in progress_slots.items():
+        draw_progress(slot, current[job_id])
@@ -0,0 +1,960 @@
+import csv
+import glob
+import importlib.util
+import io
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import metrics
+
+# Parquet support is optional: without pyarrow the CSV log simply keeps
+# all of its history and compaction is skipped. Only look pyarrow up here;
+# it is imported when the archive is first read or written.
+HAS_PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ---------------- CONFIG ----------------
+ATTENDANCE_FILE = "attendance.csv"
+ATTENDANCE_DB = "attendance.db"
+ATTENDANCE_ARCHIVE = "attendance_archive"
+# How often the background thread moves closed months into the archive
+COMPACTION_INTERVAL = 60 * 60
+# "csv" keeps the append-only attendance.csv log, "sqlite" uses attendance.db
+ATTENDANCE_BACKEND = os.environ.get("ATTENDANCE_BACKEND", "csv")
+COLUMNS = ["RollNo", "Date", "Status"]
+KEY = ["RollNo", "Date"]
+STATUSES = ["Present", "Absent"]
+ROLLUP_COLUMNS = ["RollNo", "Month", "Present", "Absent"]
+# Students below this monthly percentage are listed as short of attendance
+SHORTAGE_THRESHOLD = 75
+FULL_COLUMNS = ["RollNo", "Name", "Date", "In Time", "Out Time", "Status"]
+# Marks waiting for the CSV writer; submissions beyond this are refused
+WRITE_QUEUE_SIZE = 10_000
+# Most marks committed in one append
+WRITE_BATCH_SIZE = 500
+# Seconds a session waits to enqueue a mark and for its result
+WRITE_TIMEOUT = 10
+
+
+class WriteQueueFull(Exception):
+    """The attendance writer is saturated; the mark was not recorded."""
+
+
+# ---------------- SCHEMA ----------------
+# attendance.csv comes in two layouts: RollNo,Date,Status as created by
+# init_store, and the RollNo,Name,Date,In Time,Out Time,Status check-in
+# export. Both load into FULL_COLUMNS with these dtypes; columns a file
+# does not have come back empty. Repeated strings become categoricals and
+# times of day are durations since midnight.
+STATUS_DTYPE = pd.CategoricalDtype(STATUSES)
+ATTENDANCE_SCHEMA = {
+    "RollNo": "category",
+    "Name": "category",
+    "Date": "datetime64[ns]",
+    "In Time": "timedelta64[ns]",
+    "Out Time": "timedelta64[ns]",
+    "Status": STATUS_DTYPE,
+}
+# Rows parsed at a time, which bounds the text held in memory while loading
+LOAD_CHUNKSIZE = 100_000
+
+
+def apply_schema(df):
+    """Convert a frame of text columns to ATTENDANCE_SCHEMA."""
+    columns = {}
+    for col, dtype in ATTENDANCE_SCHEMA.items():
+        values = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if dtype == "datetime64[ns]":
+            values = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+        elif dtype == "timedelta64[ns]":
+            values = pd.to_timedelta(values, errors="coerce")
+        else:
+            values = values.astype(dtype)
+            if dtype == "category":
+                # An all-empty column gets object categories; keep them text
+                # so union_categoricals can join it with other chunks.
+                values = values.cat.set_categories(values.cat.categories.astype(str))
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _read_dtypes(header):
+    return {
+        col: "category" if ATTENDANCE_SCHEMA.get(col) == "category" else str
+        for col in header
+    }
+
+
+def iter_attendance(path=ATTENDANCE_FILE, chunksize=LOAD_CHUNKSIZE):
+    """Yield the CSV log as typed frames of at most `chunksize` rows."""
+    header = pd.read_csv(path, nrows=0).columns
+    for chunk in pd.read_csv(path, dtype=_read_dtypes(header), chunksize=chunksize):
+        yield apply_schema(chunk)
+
+
+def parse_rows(data, header, chunksize=LOAD_CHUNKSIZE):
+    """Typed frame of CSV rows (bytes without a header line) in `header` order."""
+    if not data.strip():
+        return concat_attendance([])
+    chunks = pd.read_csv(
+        io.BytesIO(data), names=header, header=None,
+        dtype=_read_dtypes(header), chunksize=chunksize,
+    )
+    return concat_attendance(apply_schema(chunk) for chunk in chunks)
+
+
+def concat_attendance(chunks):
+    """Join typed chunks, merging their per-chunk categories."""
+    chunks = list(chunks)
+    if not chunks:
+        return apply_schema(pd.DataFrame(columns=FULL_COLUMNS))
+    columns = {}
+    for col, dtype in ATTENDANCE_SCHEMA.items():
+        parts = [chunk[col] for chunk in chunks]
+        if dtype == "category":
+            columns[col] = union_categoricals(parts)
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def load_attendance(path=ATTENDANCE_FILE, chunksize=LOAD_CHUNKSIZE):
+    return concat_attendance(iter_attendance(path, chunksize))
+
+
+def memory_report(path=ATTENDANCE_FILE):
+    """Bytes per column for a default pd.read_csv load vs load_attendance."""
+    default = pd.read_csv(path).memory_usage(deep=True, index=False)
+    compact = load_attendance(path).memory_usage(deep=True, index=False)
+    report = pd.DataFrame({"Default (bytes)": default, "Compact (bytes)": compact})
+    report = report.fillna(0).astype(int)
+    report.loc["Total"] = report.sum()
+    return report
+
+
+# ---------------- FILE LOCK ----------------
+class FileLock:
+    """Exclusive advisory lock on `path`, shared with other processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+
+# ---------------- GROUP COMMIT ----------------
+class _Submission:
+    __slots__ = ("entry", "done", "result", "error", "claimed", "cancelled")
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Set under GroupCommitWriter._claim_lock: the writer claims a
+        # submission before committing it, a timed-out submitter cancels it.
+        self.claimed = False
+        self.cancelled = False
+
+
+class GroupCommitWriter:
+    """Coalesces concurrent submissions into batched commits.
+
+    Sessions put entries on a bounded queue and wait for their result. A
+    single thread takes everything that has queued up (at most
+    `max_batch`) and passes it to `commit`, which returns one result per
+    entry. While one batch is being written the next one accumulates, so
+    a burst of submissions costs a handful of commits instead of one each.
+
+    A submission that times out before the writer picks it up is
+    cancelled and never committed. Once picked up, its submitter waits
+    for the commit to finish, so a refused mark is never recorded later.
+    """
+
+    def __init__(self, commit, maxsize=WRITE_QUEUE_SIZE, max_batch=WRITE_BATCH_SIZE):
+        self._commit = commit
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.max_batch = max_batch
+        self._claim_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, entry, timeout=WRITE_TIMEOUT):
+        submission = _Submission(entry)
+        try:
+            self._queue.put(submission, timeout=timeout)
+        except queue.Full:
+            raise WriteQueueFull("Too many pending attendance submissions") from None
+        if not submission.done.wait(timeout):
+            with self._claim_lock:
+                submission.cancelled = not submission.claimed
+            if submission.cancelled:
+                raise WriteQueueFull("Timed out waiting for the attendance writer")
+            # Already being committed: its outcome is decided, so report it
+            submission.done.wait()
+        if submission.error is not None:
+            raise submission.error
+        return submission.result
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self._claim_lock:
+                batch = [s for s in batch if not s.cancelled]
+                for submission in batch:
+                    submission.claimed = True
+            if not batch:
+                continue
+            try:
+                results = self._commit([s.entry for s in batch])
+                for submission, result in zip(batch, results):
+                    submission.result = result
+            except Exception as e:
+                for submission in batch:
+                    submission.error = e
+            for submission in batch:
+                submission.done.set()
+
+
+# ---------------- CSV BACKEND ----------------
+class CsvAttendanceStore:
+    """Append-only CSV log with an in-memory (RollNo, Date) index.
+
+    The index is read once and kept up to date by `mark`, so the duplicate
+    check is a set lookup and a write appends a single row. The same pass
+    builds the present/absent rollup per (RollNo, month), which writes then
+    update in place.
+
+    Writes from every session go through one GroupCommitWriter and are
+    made under a lock file shared with other server processes. Before each
+    commit the index catches up on rows other processes appended by
+    reading the log from the last known offset.
+
+    `compact` moves closed months out of the log into Parquet files under
+    `archive_dir/year=YYYY/month=MM/`, so only the current month stays in
+    the row-oriented log.
+    """
+
+    def __init__(self, path=ATTENDANCE_FILE, archive_dir=ATTENDANCE_ARCHIVE):
+        self.path = path
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(path + ".lock")
+        self._header = None
+        self._keys = None
+        self._rollup = None
+        self._offset = 0
+        self._inode = None
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def init(self):
+        if not os.path.exists(self.path):
+            df = pd.DataFrame(columns=COLUMNS)
+            df.to_csv(self.path, index=False)
+
+    # The methods below that touch the index must hold both self._lock and
+    # self._file_lock, and call _sync first.
+    def _load_index(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+            inode = os.fstat(f.fileno()).st_ino
+        reader = csv.reader(io.StringIO(data.decode("utf-8")))
+        self._header = next(reader, None) or COLUMNS
+        self._keys, self._rollup = set(), _Rollup()
+        self._offset, self._inode = len(data), inode
+        self._index_rows(reader)
+
+        archived = self._read_archive(columns=COLUMNS)
+        if archived is not None:
+            self._keys.update(zip(archived["RollNo"], archived["Date"]))
+            for roll, day, status in archived[COLUMNS].itertuples(index=False):
+                self._rollup.count(roll, day, status)
+
+    def _index_rows(self, rows):
+        roll_i, date_i, status_i = (self._header.index(col) for col in COLUMNS)
+        width = max(roll_i, date_i, status_i)
+        for row in rows:
+            if len(row) > width:
+                self._keys.add((row[roll_i], row[date_i]))
+                self._rollup.count(row[roll_i], row[date_i], row[status_i])
+
+    def _sync(self):
+        """Catch the index up with the log as other processes left it."""
+        stat = os.stat(self.path)
+        if self._keys is None or stat.st_ino != self._inode or stat.st_size < self._offset:
+            # First use, or the log was replaced by a compaction
+            self._load_index()
+        elif stat.st_size > self._offset:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            self._offset += len(data)
+            self._index_rows(csv.reader(io.StringIO(data.decode("utf-8"))))
+
+    def _append(self, text):
+        data = text.encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(data)
+        self._offset += len(data)
+
+    def _commit(self, entries):
+        """Append the new (roll, day, status) entries in one write.
+
+        Returns True per entry that was written, False for duplicates.
+        """
+        with self._lock, self._file_lock:
+            self._sync()
+            results, accepted, seen = [], [], set()
+            for roll, day, status in entries:
+                key = (roll, day)
+                is_new = key not in self._keys and key not in seen
+                if is_new:
+                    seen.add(key)
+                    accepted.append({"RollNo": roll, "Date": day, "Status": status})
+                results.append(is_new)
+
+            if accepted:
+                # Append in the file's own column order; columns the entry
+                # does not carry (Name, In Time, ...) are left empty.
+                buf = io.StringIO()
+                writer = csv.DictWriter(
+                    buf, fieldnames=self._header, restval="", lineterminator="\n"
+                )
+                writer.writerows(accepted)
+                self._append(buf.getvalue())
+                self._keys.update(seen)
+                for row in accepted:
+                    self._rollup.count(row["RollNo"], row["Date"], row["Status"])
+        return results
+
+    def _get_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = GroupCommitWriter(self._commit)
+            return self._writer
+
+    def mark(self, roll, day, status):
+        """True if recorded, False if a duplicate; raises WriteQueueFull."""
+        return self._get_writer().submit((roll, day, status))
+
+    def mark_many(self, batch):
+        """Append every row of `batch` whose key is new, in one write.
+
+        Keys are checked against the in-memory key set, so the cost (and
+        the time both locks are held) grows with the batch, not with the
+        history. Returns a boolean array, True where the row was already
+        recorded.
+        """
+        with self._lock, self._file_lock:
+            self._sync()
+            duplicate = np.fromiter(
+                (key in self._keys for key in zip(batch["RollNo"], batch["Date"])),
+                dtype=bool,
+                count=len(batch),
+            )
+
+            accepted = batch[~duplicate]
+            if len(accepted):
+                self._append(
+                    accepted.reindex(columns=self._header).to_csv(
+                        header=False, index=False, lineterminator="\n"
+                    )
+                )
+                self._keys.update(zip(accepted["RollNo"], accepted["Date"]))
+                counts = pd.crosstab(
+                    [accepted["RollNo"], accepted["Date"].str[:7]], accepted["Status"]
+                )
+                for (roll, month), row in counts.iterrows():
+                    self._rollup.add(
+                        roll, month, int(row.get("Present", 0)), int(row.get("Absent", 0))
+                    )
+        return duplicate
+
+    def rollup(self, roll=None, month=None):
+        """Present/absent counts per (RollNo, Month), one row per pair.
+
+        `roll` and `month` restrict the rows to one student or one month.
+        """
+        with self._lock, self._file_lock:
+            self._sync()
+            rows = self._rollup.rows(roll, month)
+        return pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+
+    def read_hot(self, since=None):
+        """Rows of the log (the months not yet compacted) added after `since`.
+
+        `since` is the position returned by an earlier call. Returns
+        (rows, position, replaced): when `since` is None or the log has
+        been replaced by a compaction since then, `rows` is the whole log
+        and `replaced` is True; `rows` is None when nothing was added.
+        Only complete lines are read, so a row another process is still
+        appending is picked up next time.
+        """
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            header = next(csv.reader([f.readline().decode("utf-8")]), None) or COLUMNS
+            replaced = (
+                since is None or since[0] != stat.st_ino or since[1] > stat.st_size
+            )
+            start = f.tell() if replaced else since[1]
+            if not replaced and start == stat.st_size:
+                return None, since, False
+            f.seek(start)
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]
+        return parse_rows(data, header), (stat.st_ino, start + len(data)), replaced
+
+    # ---------- ARCHIVE ----------
+    @staticmethod
+    def _archive_schema(columns):
+        """Every archived column is text, whatever pandas would infer."""
+        import pyarrow as pa
+        return pa.schema([(col, pa.string()) for col in columns])
+
+    def _read_archive(self, columns=None, filters=None):
+        """Archived rows as text columns, or None when nothing is archived."""
+        parts = glob.glob(os.path.join(self.archive_dir, "*", "*", "*.parquet"))
+        if not HAS_PARQUET or not parts:
+            return None
+        # Logs in the three-column layout archive fewer columns
+        import pyarrow.parquet as pq
+        available = set(pq.read_schema(parts[0]).names)
+        names = [col for col in (columns or FULL_COLUMNS) if col in available]
+        # Reading with one explicit schema also covers parts written before
+        # compact() fixed the types, where an all-empty column was `null`.
+        df = pd.read_parquet(
+            self.archive_dir,
+            columns=names,
+            filters=filters,
+            schema=self._archive_schema(names),
+        )
+        return df.sort_values("Date", kind="stable") if "Date" in df.columns else df
+
+    def archived_records(self, roll, columns=None):
+        """One student's archived rows, or None when nothing is archived.
+
+        Only the requested columns are read, and RollNo is matched against
+        row-group statistics (rows are written sorted by RollNo).
+        """
+        archived = self._read_archive(columns=columns, filters=[("RollNo", "==", roll)])
+        return None if archived is None else apply_schema(archived)
+
+    def compact(self, today=None):
+        """Move rows from months before the current one into the archive.
+
+        New Parquet files are written first and the log is then replaced
+        atomically with only the current month's rows. Returns the number
+        of rows archived.
+        """
+        if not HAS_PARQUET:
+            return 0
+        month_start = (today or date.today()).replace(day=1).isoformat()
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with self._lock, self._file_lock:
+            self._sync()
+            log = pd.read_csv(self.path, dtype=str)
+            dates = pd.to_datetime(log["Date"], errors="coerce", format="%Y-%m-%d")
+            closed = dates.notna() & (log["Date"] < month_start)
+            if not closed.any():
+                return 0
+
+            archived = log[closed]
+            schema = self._archive_schema(log.columns)
+            stamp = time.time_ns()
+            for (year, month), part in archived.groupby(
+                [dates[closed].dt.year, dates[closed].dt.month]
+            ):
+                part_dir = os.path.join(self.archive_dir, f"year={year}", f"month={month:02d}")
+                os.makedirs(part_dir, exist_ok=True)
+                # One schema for every part, so a month in which a column is
+                # entirely empty is not written as type `null`
+                table = pa.Table.from_pandas(
+                    part.sort_values(KEY), schema=schema, preserve_index=False
+                )
+                pq.write_table(
+                    table,
+                    os.path.join(part_dir, f"part-{stamp}.parquet"),
+                    row_group_size=10_000,
+                )
+
+            tmp_path = self.path + ".tmp"
+            log[~closed].to_csv(tmp_path, index=False, lineterminator="\n")
+            os.replace(tmp_path, self.path)
+            # Archived keys stay in the index; only the log position moves.
+            stat = os.stat(self.path)
+            self._offset, self._inode = stat.st_size, stat.st_ino
+        return int(closed.sum())
+
+
+# ---------------- SQLITE BACKEND ----------------
+class SqliteAttendanceStore:
+    """Attendance table in an embedded SQLite database.
+
+    UNIQUE(RollNo, Date) makes the database reject duplicate marks, and WAL
+    mode lets many sessions read while one of them writes. The unique index
+    also serves lookups by RollNo (its leading column), so no separate
+    RollNo index is kept. A trigger keeps attendance_rollup in step with
+    every inserted row.
+    """
+
+    def __init__(self, path=ATTENDANCE_DB, migrate_from=ATTENDANCE_FILE):
+        self.path = path
+        self.migrate_from = migrate_from
+        # sqlite3 connections must not be shared between threads, and
+        # Streamlit runs every session in its own thread.
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def init(self):
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS attendance (
+                RollNo TEXT NOT NULL,
+                Name TEXT,
+                Date TEXT NOT NULL,
+                "In Time" TEXT,
+                "Out Time" TEXT,
+                Status TEXT,
+                UNIQUE (RollNo, Date)
+            )
+            """
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._init_rollup()
+        if self.migrate_from and os.path.exists(self.migrate_from):
+            self._migrate_csv(self.migrate_from)
+
+    def _init_rollup(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attendance_rollup'"
+            ).fetchone()
+            if not exists:
+                conn.execute(
+                    """
+                    CREATE TABLE attendance_rollup (
+                        RollNo TEXT NOT NULL,
+                        Month TEXT NOT NULL,
+                        Present INTEGER NOT NULL DEFAULT 0,
+                        Absent INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (RollNo, Month)
+                    )
+                    """
+                )
+                conn.execute(
+                    """
+                    CREATE TRIGGER attendance_rollup_insert AFTER INSERT ON attendance
+                    BEGIN
+                        INSERT INTO attendance_rollup (RollNo, Month, Present, Absent)
+                        VALUES (NEW.RollNo, substr(NEW.Date, 1, 7),
+                                NEW.Status IS 'Present', NEW.Status IS 'Absent')
+                        ON CONFLICT (RollNo, Month) DO UPDATE SET
+                            Present = Present + excluded.Present,
+                            Absent = Absent + excluded.Absent;
+                    END
+                    """
+                )
+                # Backfill from rows recorded before the rollup existed
+                conn.execute(
+                    """
+                    INSERT INTO attendance_rollup (RollNo, Month, Present, Absent)
+                    SELECT RollNo, substr(Date, 1, 7),
+                           SUM(Status IS 'Present'), SUM(Status IS 'Absent')
+                    FROM attendance GROUP BY RollNo, substr(Date, 1, 7)
+                    """
+                )
+            # The primary key serves one student's months; this one serves
+            # one month's students (the shortage list)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS attendance_rollup_month ON attendance_rollup (Month)"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_csv(self, csv_path):
+        """Copy an existing attendance CSV into the table, once."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT 1 FROM meta WHERE key = 'migrated_csv'"
+            ).fetchone()
+            if not done:
+                with open(csv_path, newline="", encoding="utf-8") as f:
+                    rows = [
+                        tuple(row.get(col) or None for col in FULL_COLUMNS)
+                        for row in csv.DictReader(f)
+                    ]
+                # Duplicate (RollNo, Date) rows in the CSV keep the first one
+                conn.executemany(
+                    'INSERT OR IGNORE INTO attendance (RollNo, Name, Date, "In Time", "Out Time", Status) '
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('migrated_csv', ?)",
+                    (os.path.abspath(csv_path),),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def mark(self, roll, day, status):
+        cur = self._conn().execute(
+            "INSERT OR IGNORE INTO attendance (RollNo, Date, Status) VALUES (?, ?, ?)",
+            (roll, day, status),
+        )
+        return cur.rowcount == 1
+
+    def mark_many(self, batch):
+        """Insert every row of `batch` whose key is new, in one transaction.
+
+        The batch is staged in a temp table and joined against the unique
+        index once. Returns a boolean array, True where the row was already
+        recorded.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS batch (pos INTEGER, RollNo TEXT, Date TEXT, Status TEXT)"
+            )
+            conn.execute("DELETE FROM temp.batch")
+            conn.executemany(
+                "INSERT INTO temp.batch VALUES (?, ?, ?, ?)",
+                zip(range(len(batch)), batch["RollNo"], batch["Date"], batch["Status"]),
+            )
+            dup_pos = [
+                pos for (pos,) in conn.execute(
+                    "SELECT b.pos FROM temp.batch b JOIN attendance a USING (RollNo, Date)"
+                )
+            ]
+            conn.execute(
+                "INSERT OR IGNORE INTO attendance (RollNo, Date, Status) "
+                "SELECT RollNo, Date, Status FROM temp.batch ORDER BY pos"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        duplicate = np.zeros(len(batch), dtype=bool)
+        duplicate[dup_pos] = True
+        return duplicate
+
+    def rollup(self, roll=None, month=None):
+        filters = {"RollNo": roll, "Month": month}
+        where = [f"{col} = ?" for col, value in filters.items() if value is not None]
+        return pd.read_sql_query(
+            "SELECT RollNo, Month, Present, Absent FROM attendance_rollup"
+            + (" WHERE " + " AND ".join(where) if where else ""),
+            self._conn(),
+            params=[value for value in filters.values() if value is not None],
+        )
+
+    def records(self, roll):
+        """One student's rows, read through the (RollNo, Date) index."""
+        return apply_schema(pd.read_sql_query(
+            'SELECT RollNo, Name, Date, "In Time", "Out Time", Status '
+            "FROM attendance WHERE RollNo = ? ORDER BY Date",
+            self._conn(),
+            params=(roll,),
+        ))
+
+
+class _Rollup:
+    """[present, absent] counters per (RollNo, month), indexed both ways.
+
+    Each counter is shared by the per-student and the per-month dicts, so
+    one student's months or one month's students are read without
+    visiting the other pairs.
+    """
+
+    def __init__(self):
+        self.by_roll = {}
+        self.by_month = {}
+
+    def add(self, roll, month, present=0, absent=0):
+        months = self.by_roll.setdefault(roll, {})
+        counter = months.get(month)
+        if counter is None:
+            counter = months[month] = [0, 0]
+            self.by_month.setdefault(month, {})[roll] = counter
+        counter[0] += present
+        counter[1] += absent
+
+    def count(self, roll, day, status):
+        """Add one (RollNo, Date, Status) row."""
+        if status in STATUSES:
+            self.add(roll, day[:7], status == "Present", status == "Absent")
+
+    def rows(self, roll=None, month=None):
+        """(RollNo, Month, Present, Absent) tuples, optionally filtered."""
+        if roll is not None:
+            months = self.by_roll.get(roll, {})
+            if month is not None:
+                months = {month: months[month]} if month in months else {}
+            return [(roll, m, p, a) for m, (p, a) in months.items()]
+        if month is not None:
+            return [(r, month, p, a) for r, (p, a) in self.by_month.get(month, {}).items()]
+        return [
+            (r, m, p, a) for r, months in self.by_roll.items() for m, (p, a) in months.items()
+        ]
+
+
+# ---------------- STORE SELECTION ----------------
+BACKENDS = {
+    "csv": CsvAttendanceStore,
+    "sqlite": SqliteAttendanceStore,
+}
+
+# Held in this imported module so one store is shared by every session in
+# the process and survives Streamlit reruns.
+_store = None
+_store_lock = threading.Lock()
+# The store whose init() has run; every rerun calls init_store()
+_initialized = None
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            if ATTENDANCE_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown attendance backend: {ATTENDANCE_BACKEND!r}")
+            _store = BACKENDS[ATTENDANCE_BACKEND]()
+        return _store
+
+
+def set_store(store):
+    """Replace the process-wide store (e.g. another backend or file)."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+# ---------------- CACHED VIEWS ----------------
+class AttendanceView:
+    """Parsed attendance records grouped by RollNo, shared by all sessions.
+
+    The hot log is read once and then tailed: rows appended since the last
+    read are parsed and added to the groups of the students they belong
+    to, so a mark costs a render the parse of that one row. A student's
+    archived rows are read (pruned to that student) on first use and kept
+    until a compaction replaces the log. The returned frames are shared
+    and must be treated as read-only.
+
+    Stores without a hot log (SQLite) answer each student with an indexed
+    query instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._store = None
+        self._position = None
+        self._hot = {}
+        self._archived = {}
+        self._by_roll = {}
+
+    def records(self, store, roll):
+        if not hasattr(store, "read_hot"):
+            return store.records(roll)
+        with self._lock:
+            if store is not self._store:
+                self._store, self._position = store, None
+            rows, self._position, replaced = store.read_hot(self._position)
+            if replaced:
+                self._hot, self._archived, self._by_roll = {}, {}, {}
+            if rows is not None:
+                for r, group in rows.groupby("RollNo", sort=False, observed=True):
+                    if r in self._hot:
+                        group = concat_attendance([self._hot[r], group])
+                    self._hot[r] = group
+                    self._by_roll.pop(r, None)
+
+            if roll not in self._by_roll:
+                if roll not in self._archived:
+                    self._archived[roll] = store.archived_records(roll)
+                parts = [self._archived[roll], self._hot.get(roll)]
+                parts = [part for part in parts if part is not None and len(part)]
+                self._by_roll[roll] = concat_attendance(parts)
+            return self._by_roll[roll]
+
+
+_view = AttendanceView()
+
+
+# ---------------- COMPACTION ----------------
+_compactor = None
+
+
+def _compaction_loop(interval):
+    while True:
+        store = get_store()
+        if hasattr(store, "compact"):
+            try:
+                store.compact()
+            except Exception:
+                # A failed run leaves the log untouched; try again later.
+                logger.exception("Attendance compaction failed")
+        time.sleep(interval)
+
+
+def start_compaction(interval=COMPACTION_INTERVAL):
+    """Start the background compaction thread once per process."""
+    global _compactor
+    with _store_lock:
+        if _compactor is None and HAS_PARQUET:
+            _compactor = threading.Thread(
+                target=_compaction_loop, args=(interval,), daemon=True
+            )
+            _compactor.start()
+
+
+# ---------------- FUNCTIONS ----------------
+def init_store():
+    """Run the store's init() once per store instance, not once per rerun."""
+    global _initialized
+    store = get_store()
+    with _store_lock:
+        if _initialized is not store:
+            store.init()
+            _initialized = store
+
+
+@metrics.timed("attendance.mark")
+def mark_attendance(roll, selected_date, status):
+    return get_store().mark(str(roll), str(selected_date), status)
+
+
+@metrics.timed("attendance.student_records")
+def get_student_attendance(roll):
+    return _view.records(get_store(), str(roll))
+
+
+@metrics.timed("attendance.summary")
+def get_attendance_summary(roll=None, month=None):
+    """Attendance percentage per student per month from the rollups.
+
+    The `roll` and `month` filters are applied by the store, so one
+    student costs their months and one month costs its students, not the
+    number of (student, month) pairs or of recorded rows.
+    """
+    summary = get_store().rollup(None if roll is None else str(roll), month)
+    summary = summary.assign(Total=summary["Present"] + summary["Absent"])
+    summary = summary[summary["Total"] > 0]
+    summary = summary.assign(
+        Percent=(summary["Present"] / summary["Total"] * 100).round(1)
+    )
+    return summary.sort_values(["Month", "RollNo"]).reset_index(drop=True)
+
+
+def get_shortage_list(month, threshold=SHORTAGE_THRESHOLD):
+    summary = get_attendance_summary(month=month)
+    return summary[summary["Percent"] < threshold]
+
+
+def read_bulk_upload(file):
+    """Read an uploaded CSV with RollNo, Date and Status columns."""
+    df = pd.read_csv(file, dtype=str)
+    missing = [col for col in COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Uploaded file is missing columns: {', '.join(missing)}")
+    return df[COLUMNS]
+
+
+@metrics.timed("attendance.mark_bulk")
+def mark_attendance_bulk(rows):
+    """Mark many (RollNo, Date, Status) rows at once.
+
+    `rows` is a DataFrame with those columns or an iterable of tuples;
+    dates are YYYY-MM-DD. Invalid rows, then repeats among the valid
+    rows, are rejected up front, the rest are checked against existing
+    data in one pass and written in a single batch. Returns (accepted,
+    rejected); `rejected` carries a Reason column.
+    """
+    if isinstance(rows, pd.DataFrame):
+        batch = rows[COLUMNS].copy()
+    else:
+        batch = pd.DataFrame(list(rows), columns=COLUMNS)
+    batch = batch.reset_index(drop=True)
+
+    batch["RollNo"] = batch["RollNo"].astype(str).str.strip()
+    batch["Status"] = batch["Status"].astype(str).str.strip()
+    # Dates must be in the store's key format; anything else is rejected
+    # rather than guessed at per row
+    dates = pd.to_datetime(
+        batch["Date"].astype(str).str.strip(), format="%Y-%m-%d", errors="coerce"
+    )
+    batch["Date"] = dates.dt.strftime("%Y-%m-%d")
+
+    reason = pd.Series("", index=batch.index, dtype=object)
+    reason[~batch["Status"].isin(STATUSES)] = "Invalid status"
+    reason[dates.isna()] = "Invalid date"
+    reason[batch["RollNo"].isin(["", "nan"])] = "Missing roll number"
+    # Only rows that passed validation can repeat one another
+    valid = batch[reason == ""]
+    reason[valid.index[valid.duplicated(KEY, keep="first")]] = "Repeated in upload"
+
+    candidates = batch[reason == ""]
+    if len(candidates):
+        duplicate = get_store().mark_many(candidates)
+        reason[candidates.index[duplicate]] = "Already marked"
+
+    accepted = batch[reason == ""]
+    rejected = batch[reason != ""].assign(Reason=reason[reason != ""])
+    return accepted, rejected
@@ -0,0 +1,167 @@
+"""Headless load test for the attendance functions.
+
+Generates a synthetic roster and attendance history, then times
+authenticate, mark_attendance and get_student_attendance outside
+Streamlit, single-threaded and with concurrent writers.
+
+    python bench_attendance.py --students 10000 --rows 1000000 --writers 16
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import attendance_store
+import roster
+
+
+# ---------------- DATA ----------------
+def make_roster(students):
+    return {str(100000 + i): f"pw{i}" for i in range(students)}
+
+
+def make_history(path, rolls, rows, start, seed=0):
+    """Write `rows` marks in the RollNo,Date,Status layout, one day at a time."""
+    rng = np.random.default_rng(seed)
+    rolls = np.array(rolls)
+    days = -(-rows // len(rolls))
+    day_index = np.repeat(np.arange(days), len(rolls))[:rows]
+    history = pd.DataFrame({
+        "RollNo": np.tile(rolls, days)[:rows],
+        "Date": (np.datetime64(start) + day_index).astype(str),
+        "Status": np.where(rng.random(rows) < 0.85, "Present", "Absent"),
+    })
+    history.to_csv(path, index=False, lineterminator="\n")
+    return start + timedelta(days=int(days))
+
+
+# ---------------- TIMING ----------------
+def timed_calls(fn, args_list):
+    latencies = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def report(name, latencies, wall):
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    print(
+        f"{name:<34} n={len(ms):>7}  p50={p50:9.3f}ms  p95={p95:9.3f}ms  "
+        f"p99={p99:9.3f}ms  {len(ms) / wall:10.1f} ops/s"
+    )
+
+
+def run(name, fn, args_list, writers=1):
+    t0 = time.perf_counter()
+    if writers == 1:
+        latencies = timed_calls(fn, args_list)
+    else:
+        shards = [args_list[i::writers] for i in range(writers)]
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            results = pool.map(lambda shard: timed_calls(fn, shard), shards)
+            latencies = [lat for shard in results for lat in shard]
+    report(name, latencies, time.perf_counter() - t0)
+
+
+# ---------------- SCENARIOS ----------------
+def bench_backend(backend, workdir, students, rolls, next_day, ops, writers, seed):
+    csv_path = os.path.join(workdir, "attendance.csv")
+    if backend == "csv":
+        store = attendance_store.CsvAttendanceStore(
+            csv_path, archive_dir=os.path.join(workdir, "archive")
+        )
+    else:
+        store = attendance_store.SqliteAttendanceStore(
+            os.path.join(workdir, "attendance.db"), migrate_from=csv_path
+        )
+    t0 = time.perf_counter()
+    store.init()
+    attendance_store.set_store(store)
+    print(f"\n[{backend}] init {time.perf_counter() - t0:.2f}s")
+
+    rng = random.Random(seed)
+
+    def new_marks(first_day):
+        # Distinct (roll, day) keys, filling one day for every student first
+        return [
+            (rolls[i % students], first_day + timedelta(days=i // students), "Present")
+            for i in range(ops)
+        ]
+
+    sample = [(rng.choice(rolls),) for _ in range(ops)]
+    run("get_student_attendance (first)", attendance_store.get_student_attendance, sample[:1])
+    run("get_student_attendance (cached)", attendance_store.get_student_attendance, sample)
+
+    marks = new_marks(next_day)
+    run("mark_attendance (new)", attendance_store.mark_attendance, marks)
+    run("mark_attendance (duplicate)", attendance_store.mark_attendance, marks)
+
+    next_day += timedelta(days=ops // students + 1)
+    marks = new_marks(next_day)
+    run(f"mark_attendance x{writers} writers", attendance_store.mark_attendance, marks, writers)
+
+    run("get_student_attendance (after write)", attendance_store.get_student_attendance, sample[:1])
+    return next_day + timedelta(days=ops // students + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--ops", type=int, default=5_000, help="calls per scenario")
+    parser.add_argument("--writers", type=int, default=16, help="concurrent writer threads")
+    parser.add_argument("--backend", choices=["csv", "sqlite", "both"], default="both")
+    parser.add_argument("--workdir", help="keep generated files here instead of a temp dir")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--hash-iterations", type=int, default=1_000,
+        help=f"PBKDF2 rounds for the synthetic roster (the app uses {roster.HASH_ITERATIONS})",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+
+        students = make_roster(args.students)
+        rolls = list(students)
+        roster_path = os.path.join(workdir, "roster.csv")
+        t0 = time.perf_counter()
+        roster.write_roster(roster_path, students, iterations=args.hash_iterations)
+        roster.set_roster(roster.RosterStore(roster_path))
+        print(f"hashed roster of {args.students} students in {time.perf_counter() - t0:.2f}s")
+
+        t0 = time.perf_counter()
+        next_day = make_history(
+            os.path.join(workdir, "attendance.csv"), rolls, args.rows, date(2020, 1, 1), args.seed
+        )
+        print(f"generated {args.rows} rows for {args.students} students in {time.perf_counter() - t0:.2f}s")
+
+        rng = random.Random(args.seed)
+        logins = []
+        for _ in range(args.ops):
+            roll = rng.choice(rolls)
+            password = students[roll] if rng.random() < 0.9 else "wrong"
+            logins.append((roll, password))
+        print()
+        run("authenticate (cold)", roster.authenticate, logins)
+        run("authenticate (verified cache)", roster.authenticate, logins)
+
+        backends = ["csv", "sqlite"] if args.backend == "both" else [args.backend]
+        for backend in backends:
+            next_day = bench_backend(
+                backend, workdir, args.students, rolls, next_day, args.ops, args.writers, args.seed
+            )
+
+
+if __name__ == "__main__":
+    main()
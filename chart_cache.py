@@ -0,0 +1,70 @@
+import io
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# =============================
+# CONFIG
+# =============================
+# Rendered charts kept in memory before the least recently used is dropped
+CHART_CACHE_SIZE = 64
+
+
+# =============================
+# RENDERED CHART CACHE
+# =============================
+class ChartCache:
+    """PNG bytes of rendered charts keyed by (chart kind, data version).
+
+    A repeat view of a chart for the same data version is a dictionary
+    lookup with no matplotlib work. Figures are built with the
+    object-oriented `Figure` API rather than pyplot, so they are never
+    registered with pyplot's global figure manager (which is not
+    thread-safe) and are freed as soon as the PNG has been written.
+    """
+
+    def __init__(self, maxsize=CHART_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._charts = OrderedDict()
+
+    def get(self, kind, version, draw):
+        """PNG bytes for `kind` at `version`; `draw(ax)` renders on a miss."""
+        key = (kind, version)
+        with self._lock:
+            if key in self._charts:
+                self._charts.move_to_end(key)
+                return self._charts[key]
+
+        png = self._render(draw)
+        with self._lock:
+            self._charts[key] = png
+            self._charts.move_to_end(key)
+            while len(self._charts) > self.maxsize:
+                self._charts.popitem(last=False)
+        return png
+
+    @staticmethod
+    @metrics.timed("chart.render")
+    def _render(draw):
+        from matplotlib.figure import Figure
+
+        fig = Figure()
+        ax = fig.subplots()
+        draw(ax)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", bbox_inches="tight")
+        return buf.getvalue()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_chart_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChartCache()
+        return _cache
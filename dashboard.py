@@ -1,8 +1,20 @@
+import profiling
+import metrics
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
 
+from chart_cache import get_chart_cache
+from employee_store import (
+    DEPARTMENTS,
+    EMPLOYEE_COLUMNS,
+    INT32_MAX,
+    get_employee_store,
+    memory_report,
+    read_import_chunks,
+)
+from salary_sketch import HISTOGRAM_BIN_WIDTH, SKETCH_ACCURACY, exact_quantiles
+
 # =============================
 # PAGE CONFIG (Real Company Style)
 # =============================
@@ -11,6 +23,7 @@ st.set_page_config(
     page_icon="🏢",
     layout="wide"
 )
+profiling.start_rerun()
 
 # =============================
 # COMPANY THEME HEADER
@@ -33,17 +46,15 @@ st.markdown(
 )
 
 # =============================
-# INITIAL ENTERPRISE DATA
+# SHARED ENTERPRISE DATA
 # =============================
-if "employees" not in st.session_state:
-    st.session_state.employees = pd.DataFrame({
-        "Employee ID": [1001, 1002, 1003, 1004, 1005],
-        "Name": ["Ravi Kumar", "Anjali Sharma", "Suresh Reddy", "Meena Patel", "Arjun Singh"],
-        "Department": ["IT", "HR", "Finance", "IT", "Marketing"],
-        "Role": ["Software Engineer", "HR Manager", "Accountant", "QA Engineer", "Marketing Executive"],
-        "Salary": [75000, 65000, 60000, 55000, 50000],
-        "Date Joined": ["2021-06-01", "2020-08-15", "2019-03-10", "2022-01-05", "2023-07-12"]
-    })
+# One process-wide store; each rerun reads the current snapshot (no copy)
+store = get_employee_store()
+snapshot = store.snapshot()
+employees = snapshot.employees
+aggregates = snapshot.aggregates
+charts = get_chart_cache()
+profiling.checkpoint("data")
 
 # =============================
 # SIDEBAR (Corporate Navigation)
@@ -71,9 +82,9 @@ if menu == "Executive Summary":
     st.markdown('<div class="main-title">Executive Summary</div>', unsafe_allow_html=True)
     st.markdown('<div class="sub-title">High-level business insights</div>', unsafe_allow_html=True)
 
-    total_emp = len(st.session_state.employees)
-    avg_salary = int(st.session_state.employees["Salary"].mean())
-    dept_count = st.session_state.employees["Department"].nunique()
+    total_emp = aggregates.total_count()
+    avg_salary = int(aggregates.mean_salary())
+    dept_count = aggregates.department_count()
 
     col1, col2, col3 = st.columns(3)
     col1.metric("Total Employees", total_emp)
@@ -82,11 +93,12 @@ if menu == "Executive Summary":
 
     st.divider()
 
-    dept_data = st.session_state.employees["Department"].value_counts()
-    fig, ax = plt.subplots()
-    ax.pie(dept_data, labels=dept_data.index, autopct="%1.1f%%")
-    ax.set_title("Workforce Distribution")
-    st.pyplot(fig)
+    def draw_workforce(ax):
+        dept_data = aggregates.department_counts()
+        ax.pie(dept_data, labels=dept_data.index, autopct="%1.1f%%")
+        ax.set_title("Workforce Distribution")
+
+    st.image(charts.get("workforce_pie", snapshot.version, draw_workforce))
 
 # =============================
 # COMPANY OVERVIEW
@@ -111,18 +123,16 @@ elif menu == "Company Overview":
 elif menu == "Departments":
     st.markdown('<div class="main-title">Department Analytics</div>', unsafe_allow_html=True)
 
-    dept_summary = st.session_state.employees.groupby("Department").agg({
-        "Employee ID": "count",
-        "Salary": "mean"
-    }).rename(columns={"Employee ID": "Employee Count", "Salary": "Avg Salary"})
+    dept_summary = aggregates.department_summary()
 
     st.dataframe(dept_summary)
 
-    fig, ax = plt.subplots()
-    ax.bar(dept_summary.index, dept_summary["Employee Count"])
-    ax.set_ylabel("Employees")
-    ax.set_title("Employees by Department")
-    st.pyplot(fig)
+    def draw_departments(ax):
+        ax.bar(dept_summary.index, dept_summary["Employee Count"])
+        ax.set_ylabel("Employees")
+        ax.set_title("Employees by Department")
+
+    st.image(charts.get("department_bar", snapshot.version, draw_departments))
 
 # =============================
 # EMPLOYEE MANAGEMENT (HR VIEW)
@@ -130,13 +140,32 @@ elif menu == "Departments":
 elif menu == "Employee Management":
     st.markdown('<div class="main-title">Employee Directory</div>', unsafe_allow_html=True)
 
-    search = st.text_input("Search Employee (Name / Department)")
-    df = st.session_state.employees
+    search = st.text_input("Search Employee (Name / Department / Role)")
+    positions = store.search(search, snapshot, rank=True) if search else None
+
+    col1, col2, col3 = st.columns(3)
+    sort_options = (["Best match"] if search else []) + EMPLOYEE_COLUMNS
+    sort_by = col1.selectbox("Sort by", sort_options)
+    order = col2.radio("Order", ["Ascending", "Descending"], horizontal=True)
+    page_size = col3.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+
+    matches = len(employees) if positions is None else len(positions)
+    page_count = max(-(-matches // page_size), 1)
+    page_no = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
 
-    if search:
-        df = df[df.apply(lambda row: search.lower() in row.astype(str).str.lower().to_string(), axis=1)]
+    # Only the requested page is built and sent to the browser
+    page, matches = store.page(
+        snapshot, None if sort_by == "Best match" else sort_by, ascending=order == "Ascending",
+        page=page_no - 1, page_size=page_size, positions=positions
+    )
+    st.dataframe(page)
+    first = (page_no - 1) * page_size
+    st.caption(f"Showing {min(first + 1, matches)}–{first + len(page)} of {matches} employees")
 
-    st.dataframe(df)
+    with st.expander("Dataset memory footprint"):
+        # The expander body runs on every rerun, open or not
+        if st.button("Measure memory usage"):
+            st.dataframe(memory_report(employees))
 
 # =============================
 # COMPENSATION ANALYTICS (FINANCE VIEW)
@@ -144,15 +173,41 @@ elif menu == "Employee Management":
 elif menu == "Compensation Analytics":
     st.markdown('<div class="main-title">Salary & Compensation</div>', unsafe_allow_html=True)
 
-    role_salary = st.session_state.employees.groupby("Role")["Salary"].mean().sort_values(ascending=False)
+    role_salary = aggregates.role_mean_salary()
 
     st.dataframe(role_salary.reset_index(name="Average Salary"))
 
-    fig, ax = plt.subplots()
-    ax.barh(role_salary.index, role_salary.values)
-    ax.set_xlabel("Salary (INR)")
-    ax.set_title("Average Salary by Role")
-    st.pyplot(fig)
+    def draw_role_salary(ax):
+        ax.barh(role_salary.index, role_salary.values)
+        ax.set_xlabel("Salary (INR)")
+        ax.set_title("Average Salary by Role")
+
+    st.image(charts.get("role_salary_barh", snapshot.version, draw_role_salary))
+
+    st.divider()
+    st.subheader("Salary Distribution")
+
+    distribution = snapshot.distribution
+    method = st.radio("Percentiles", ["Approximate (fast)", "Exact"], horizontal=True)
+    if method == "Exact":
+        st.dataframe(exact_quantiles(employees))
+    else:
+        st.dataframe(distribution.quantiles())
+        st.caption(
+            f"Sketched percentiles are within {SKETCH_ACCURACY:.0%} of the exact values "
+            "(both take the lower salary at a percentile rank; no interpolation)"
+        )
+
+    hist_dept = st.selectbox("Histogram for", ["All"] + distribution.departments())
+    hist = distribution.histogram(None if hist_dept == "All" else hist_dept)
+
+    def draw_histogram(ax):
+        ax.bar(hist.index, hist.values, width=HISTOGRAM_BIN_WIDTH, align="edge")
+        ax.set_xlabel("Salary (INR)")
+        ax.set_ylabel("Employees")
+        ax.set_title(f"Salary Histogram ({hist_dept})")
+
+    st.image(charts.get(("salary_histogram", hist_dept), snapshot.version, draw_histogram))
 
 # =============================
 # ADD EMPLOYEE (DATA ENTRY FORM)
@@ -160,29 +215,52 @@ elif menu == "Compensation Analytics":
 elif menu == "Add Employee":
     st.markdown('<div class="main-title">Add New Employee</div>', unsafe_allow_html=True)
 
-    with st.form("add_employee_form"):
-        emp_id = st.number_input("Employee ID", min_value=1000, step=1)
-        name = st.text_input("Full Name")
-        department = st.selectbox("Department", ["IT", "HR", "Finance", "Marketing", "Operations"])
-        role = st.text_input("Role")
-        salary = st.number_input("Salary (INR)", min_value=0, step=1000)
-        date_joined = st.date_input("Date Joined", datetime.today())
-
-        submit = st.form_submit_button("Add Employee")
-
-    if submit:
-        new_row = pd.DataFrame({
-            "Employee ID": [emp_id],
-            "Name": [name],
-            "Department": [department],
-            "Role": [role],
-            "Salary": [salary],
-            "Date Joined": [str(date_joined)]
-        })
-
-        st.session_state.employees = pd.concat(
-            [st.session_state.employees, new_row], ignore_index=True
-        )
+    mode = st.radio("Mode", ["Single employee", "Bulk import"], horizontal=True)
+
+    if mode == "Single employee":
+        with st.form("add_employee_form"):
+            emp_id = st.number_input("Employee ID", min_value=1000, max_value=INT32_MAX, step=1)
+            name = st.text_input("Full Name")
+            department = st.selectbox("Department", DEPARTMENTS)
+            role = st.text_input("Role")
+            salary = st.number_input("Salary (INR)", min_value=0, max_value=INT32_MAX, step=1000)
+            date_joined = st.date_input("Date Joined", datetime.today())
+
+            submit = st.form_submit_button("Add Employee")
+
+        if submit:
+            new_row = pd.DataFrame({
+                "Employee ID": [emp_id],
+                "Name": [name],
+                "Department": [department],
+                "Role": [role],
+                "Salary": [salary],
+                "Date Joined": [str(date_joined)]
+            })
+
+            try:
+                store.add(new_row)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success("Employee record added successfully")
+                st.info("All dashboards and analytics have been updated in real time")
+
+    else:
+        st.caption("Columns: " + ", ".join(EMPLOYEE_COLUMNS))
+        uploaded = st.file_uploader("Employee file", type=["csv", "parquet"])
+
+        if uploaded is not None and st.button("Import Employees"):
+            try:
+                added, rejected = store.import_employees(read_import_chunks(uploaded, uploaded.name))
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success(f"{added} employee records imported")
+                if len(rejected):
+                    st.warning(f"{len(rejected)} rows were rejected")
+                    st.dataframe(rejected)
 
-        st.success("Employee record added successfully")
-        st.info("All dashboards and analytics have been updated in real time")
+profiling.checkpoint(f"page: {menu}")
+profiling.render_report()
+metrics.export("dashboard")
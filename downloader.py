@@ -0,0 +1,507 @@
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# =============================
+# CONFIG
+# =============================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
+# Append-only log of job state changes, replayed when the server starts
+DOWNLOAD_JOURNAL = os.environ.get("DOWNLOAD_JOURNAL", os.path.join(DOWNLOAD_DIR, "jobs.jsonl"))
+# Saved file and metadata per (video ID, format), so repeats skip yt-dlp
+DOWNLOAD_CACHE = os.environ.get("DOWNLOAD_CACHE", os.path.join(DOWNLOAD_DIR, "cache.jsonl"))
+# Final path, size and checksum of every job's file; the library listing
+DOWNLOAD_MANIFEST = os.environ.get("DOWNLOAD_MANIFEST", os.path.join(DOWNLOAD_DIR, "manifest.jsonl"))
+# Downloads running at the same time; further jobs wait in the queue
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "3"))
+# Most progress notifications per second; status changes are always sent at once
+PROGRESS_RATE = float(os.environ.get("PROGRESS_RATE", "4"))
+
+FORMATS = ["best (video+audio)", "mp4 (video)", "mp3 (audio only)"]
+# Job states, in the order a successful job goes through them
+QUEUED, DOWNLOADING, FINALIZING, FINISHED, ERROR = (
+    "queued", "downloading", "finalizing", "finished", "error"
+)
+# A job that was queued or running when the server stopped
+INTERRUPTED = "interrupted"
+# Fields of a Job written to the journal
+JOURNAL_FIELDS = ("id", "url", "choice", "opts", "status", "path", "title", "error", "submitted", "cached")
+
+# Postprocessor that moves the finished file into place, as hooks report it
+FINAL_POSTPROCESSOR = "MoveFilesAfterDownload"
+
+# watch?v=ID, youtu.be/ID, /shorts/ID, /embed/ID, /live/ID, /v/ID
+VIDEO_ID_RE = re.compile(
+    r"(?:[?&]v=|youtu\.be/|/(?:shorts|embed|live|v)/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])"
+)
+
+
+def build_options(choice, download_dir=DOWNLOAD_DIR):
+    """yt-dlp options for one of FORMATS."""
+    opts = {
+        # The video ID keeps two videos with the same title apart
+        "outtmpl": os.path.join(download_dir, "%(title)s [%(id)s].%(ext)s"),
+        "noplaylist": True,
+        "quiet": True,
+        "no_warnings": True,
+        # keep filenames safe for every filesystem
+        "restrictfilenames": True,
+    }
+    if choice == "best (video+audio)":
+        opts["format"] = "bestvideo+bestaudio/best"
+    elif choice == "mp4 (video)":
+        opts["format"] = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/mp4"
+    else:  # mp3
+        opts["format"] = "bestaudio/best"
+        opts["postprocessors"] = [
+            {
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": "mp3",
+                "preferredquality": "192",
+            }
+        ]
+    return opts
+
+
+def video_id(url):
+    """YouTube video ID in `url`, or None if it has none."""
+    match = VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def format_key(opts):
+    """What determines the output file for a video: format and audio conversion."""
+    codecs = [pp.get("preferredcodec", "") for pp in opts.get("postprocessors", [])]
+    return "|".join([opts.get("format", "")] + codecs)
+
+
+def downloaded_path(info):
+    """Final path of the file yt-dlp wrote, after any postprocessing."""
+    downloads = info.get("requested_downloads") or [{}]
+    return downloads[0].get("filepath") or info.get("filepath") or info.get("_filename")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# =============================
+# JOBS
+# =============================
+class Job:
+    """State of one queued download, updated by its worker thread."""
+
+    __slots__ = (
+        "id", "url", "choice", "opts", "status", "downloaded", "total",
+        "filename", "path", "title", "error", "submitted", "cached",
+    )
+
+    def __init__(self, url, choice, opts=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.choice = choice
+        self.opts = opts or {}
+        self.status = QUEUED
+        self.downloaded = 0
+        self.total = None
+        self.filename = ""
+        self.path = None
+        self.title = ""
+        self.error = None
+        self.submitted = time.time()
+        self.cached = False
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(record["url"], record["choice"], record.get("opts"))
+        for field in JOURNAL_FIELDS:
+            if field in record:
+                setattr(job, field, record[field])
+        if job.path:
+            job.filename = os.path.basename(job.path)
+        return job
+
+    def record(self):
+        return {field: getattr(self, field) for field in JOURNAL_FIELDS}
+
+    @property
+    def done(self):
+        return self.status in (FINISHED, ERROR, INTERRUPTED)
+
+    def percent(self):
+        if self.status in (FINALIZING, FINISHED):
+            return 100
+        if self.total:
+            return int(min(self.downloaded / self.total * 100, 100))
+        return None
+
+
+# =============================
+# PROGRESS NOTIFICATION
+# =============================
+class ProgressNotifier:
+    """Wakes progress consumers when jobs change, at most `rate` times a second.
+
+    Jobs already hold only their latest state (a hook overwrites the
+    fields), so a notification just bumps `version`. Progress ticks
+    arriving faster than the rate are coalesced into one trailing
+    notification; status changes notify immediately. Consumers block in
+    `wait` instead of polling.
+    """
+
+    def __init__(self, rate=PROGRESS_RATE):
+        self.interval = 1 / rate
+        self.version = 0
+        self._cond = threading.Condition()
+        self._last = float("-inf")
+        self._pending = False
+
+    def changed(self, urgent=False):
+        with self._cond:
+            now = time.monotonic()
+            if urgent or now - self._last >= self.interval:
+                self._publish(now)
+            elif not self._pending:
+                # Send the latest state once the current window closes
+                self._pending = True
+                timer = threading.Timer(self.interval - (now - self._last), self._flush)
+                timer.daemon = True
+                timer.start()
+
+    def _flush(self):
+        with self._cond:
+            if self._pending:
+                self._publish(time.monotonic())
+
+    def _publish(self, now):
+        self.version += 1
+        self._last = now
+        self._pending = False
+        self._cond.notify_all()
+
+    def wait(self, since, timeout=None):
+        """Block until `version` moves past `since` (or `timeout`); returns it."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != since, timeout)
+            return self.version
+
+
+# =============================
+# DOWNLOAD CACHE
+# =============================
+class DownloadCache:
+    """Saved file path and metadata per (video ID, format key).
+
+    Entries are appended to a JSON Lines file (the last one for a key
+    wins) and held in a dict, so a lookup is a dictionary hit. Each entry
+    carries the file's size and SHA-256; an entry whose file has since
+    been deleted or has another size counts as a miss, and callers check
+    the checksum against the manifest.
+    """
+
+    def __init__(self, path=DOWNLOAD_CACHE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._entries[(entry["video_id"], entry["format"])] = entry
+
+    def get(self, vid, fmt):
+        with self._lock:
+            entry = self._entries.get((vid, fmt))
+        if entry is None or "sha256" not in entry:
+            # Entries from before checksums were kept cannot be verified
+            return None
+        try:
+            size = os.path.getsize(entry["path"])
+        except OSError:
+            return None
+        return entry if size == entry["size"] else None
+
+    def put(self, vid, fmt, path, title, size, sha256):
+        entry = {
+            "video_id": vid, "format": fmt, "path": path, "title": title,
+            "size": size, "sha256": sha256, "saved": time.time(),
+        }
+        with self._lock:
+            self._entries[(vid, fmt)] = entry
+            with open(self.path, "a", encoding="utf-8", newline="\n") as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry
+
+
+# =============================
+# MANIFEST
+# =============================
+class DownloadManifest:
+    """Final path, size and SHA-256 of each job's file, keyed by job id.
+
+    Entries are written by the download hooks as soon as yt-dlp has moved
+    the file into place, appended to a JSON Lines file and held in dicts:
+    looking up a job's file is a dictionary hit, and the library is paged
+    from the saved files in the order they were saved, without listing
+    or stat-ing the downloads directory.
+    """
+
+    def __init__(self, path=DOWNLOAD_MANIFEST):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_job = {}
+        # One entry per file, most recently saved last
+        self._by_path = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._add(entry)
+
+    def _add(self, entry):
+        self._by_job[entry["job_id"]] = entry
+        self._by_path.pop(entry["path"], None)
+        self._by_path[entry["path"]] = entry
+
+    def get(self, job_id):
+        with self._lock:
+            return self._by_job.get(job_id)
+
+    def for_path(self, path):
+        """The latest entry saved at `path`, or None."""
+        with self._lock:
+            return self._by_path.get(path)
+
+    def record(self, job_id, path, title=""):
+        """Add `job_id`'s file; the checksum is reused if the file is unchanged."""
+        stat = os.stat(path)
+        size = stat.st_size
+        with self._lock:
+            known = self._by_path.get(path)
+        if (known is not None and known["size"] == size
+                and known.get("mtime_ns") == stat.st_mtime_ns):
+            sha256 = known["sha256"]
+        else:
+            sha256 = file_sha256(path)
+        entry = {
+            "job_id": job_id, "path": path, "name": os.path.basename(path),
+            "title": title, "size": size, "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256, "saved": time.time(),
+        }
+        with self._lock:
+            self._add(entry)
+            with open(self.path, "a", encoding="utf-8", newline="\n") as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_path)
+
+    def page(self, page=0, page_size=20):
+        """One page of saved files, newest first."""
+        with self._lock:
+            newest = reversed(self._by_path.values())
+            return list(itertools.islice(newest, page * page_size, (page + 1) * page_size))
+
+
+class DownloadQueue:
+    """Runs submitted downloads on a bounded pool of worker threads.
+
+    `submit` returns immediately; at most `workers` downloads run at once
+    and the rest wait in the executor's queue. Progress hooks update each
+    Job in place, so a script run only reads `jobs()` and never waits on
+    a download.
+
+    Meant to be shared by every session of the server process. Each state
+    change is appended to `journal` (progress ticks are not), and a new
+    queue replays it: finished and failed jobs are listed again, and jobs
+    that were still queued or running are marked interrupted and can be
+    retried. The journal is rewritten with one line per job on load, so
+    it does not grow across restarts.
+
+    A URL whose video was already saved in the same format is answered
+    from `cache` without starting yt-dlp. Every finished job's file is
+    recorded in `manifest`.
+    """
+
+    def __init__(self, workers=DOWNLOAD_WORKERS, download_dir=DOWNLOAD_DIR,
+                 journal=DOWNLOAD_JOURNAL, cache=DOWNLOAD_CACHE, manifest=DOWNLOAD_MANIFEST):
+        self.download_dir = download_dir
+        self.journal = journal
+        os.makedirs(download_dir, exist_ok=True)
+        self.cache = DownloadCache(cache)
+        self.manifest = DownloadManifest(manifest)
+        self.progress = ProgressNotifier()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download")
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._jobs = self._replay()
+
+    def _replay(self):
+        jobs = {}
+        if os.path.exists(self.journal):
+            with open(self.journal, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        continue
+                    if record.get("removed"):
+                        jobs.pop(record["id"], None)
+                    elif record["id"] in jobs:
+                        for field in JOURNAL_FIELDS:
+                            if field in record:
+                                setattr(jobs[record["id"]], field, record[field])
+                    elif "url" in record:
+                        jobs[record["id"]] = Job.from_record(record)
+        for job in jobs.values():
+            if not job.done:
+                job.status = INTERRUPTED
+
+        tmp = f"{self.journal}.tmp"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            for job in jobs.values():
+                f.write(json.dumps(job.record()) + "\n")
+        os.replace(tmp, self.journal)
+        return jobs
+
+    def _log(self, record):
+        with self._journal_lock:
+            with open(self.journal, "a", encoding="utf-8", newline="\n") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def _set_status(self, job, status):
+        job.status = status
+        self._log({"id": job.id, "status": status, "path": job.path, "title": job.title, "error": job.error})
+        self.progress.changed(urgent=True)
+
+    def submit(self, url, choice, opts):
+        job = Job(url, choice, opts)
+        vid = video_id(url)
+        hit = self.cache.get(vid, format_key(opts)) if vid else None
+        if hit is not None:
+            # Another job may have written a different file at that path
+            saved = self.manifest.for_path(hit["path"])
+            if saved is None or saved["sha256"] != hit["sha256"]:
+                hit = None
+        if hit is not None:
+            job.status, job.cached = FINISHED, True
+            job.path, job.title = hit["path"], hit["title"]
+            job.filename = os.path.basename(job.path)
+            self.manifest.record(job.id, job.path, job.title)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._log(job.record())
+        self.progress.changed(urgent=True)
+        if hit is None:
+            self._executor.submit(self._run, job, dict(opts))
+        return job
+
+    def retry(self, job_id):
+        """Queue an interrupted or failed job again under the same id."""
+        with self._lock:
+            job = self._jobs[job_id]
+        job.error = None
+        job.downloaded, job.total = 0, None
+        self._set_status(job, QUEUED)
+        self._executor.submit(self._run, job, dict(job.opts))
+        return job
+
+    def jobs(self):
+        """All jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def active(self):
+        return sum(not job.done for job in self.jobs())
+
+    def clear_finished(self):
+        with self._lock:
+            cleared = [k for k, job in self._jobs.items() if job.done]
+            for k in cleared:
+                del self._jobs[k]
+        for k in cleared:
+            self._log({"id": k, "removed": True})
+        self.progress.changed(urgent=True)
+
+    def _hook(self, job, d):
+        status = d.get("status")
+        if status == "downloading":
+            job.status = DOWNLOADING
+            job.downloaded = d.get("downloaded_bytes", 0)
+            job.total = d.get("total_bytes") or d.get("total_bytes_estimate")
+            job.filename = os.path.basename(d.get("filename", ""))
+            self.progress.changed()
+        elif status == "finished":
+            # The downloaded file, before any postprocessing renames it
+            job.path = d.get("filename") or job.path
+            if job.status != FINALIZING:
+                self._set_status(job, FINALIZING)
+
+    def _postprocessor_hook(self, job, d):
+        if d.get("status") != "finished":
+            return
+        info = d.get("info_dict") or {}
+        job.path = info.get("filepath") or job.path
+        # MoveFilesAfterDownloadPP runs last and puts the file at its final
+        # path; hooks name a postprocessor by pp_key(), without the PP suffix
+        if d.get("postprocessor") == FINAL_POSTPROCESSOR and job.path and os.path.exists(job.path):
+            job.title = info.get("title", job.title)
+            self.manifest.record(job.id, job.path, job.title)
+
+    @metrics.timed("download.run")
+    def _run(self, job, opts):
+        self._set_status(job, DOWNLOADING)
+        opts["progress_hooks"] = [lambda d: self._hook(job, d)]
+        opts["postprocessor_hooks"] = [lambda d: self._postprocessor_hook(job, d)]
+        try:
+            from yt_dlp import YoutubeDL
+
+            with YoutubeDL(opts) as ydl:
+                info = ydl.extract_info(job.url, download=True)
+            job.status = FINALIZING
+            # Everything needed is in the returned info; no second extraction
+            job.title = info.get("title", "")
+            entry = self.manifest.get(job.id)
+            if entry is None:
+                # The hooks did not see a final file (e.g. it already existed)
+                path = downloaded_path(info) or job.path
+                if path and os.path.exists(path):
+                    entry = self.manifest.record(job.id, path, job.title)
+        except Exception as e:
+            job.error = str(e)
+            self._set_status(job, ERROR)
+            return
+        if entry is None:
+            job.error = "yt-dlp did not report a downloaded file."
+            self._set_status(job, ERROR)
+        else:
+            job.path = entry["path"]
+            job.filename = entry["name"]
+            vid = info.get("id") or video_id(job.url)
+            if vid:
+                self.cache.put(
+                    vid, format_key(opts), job.path, job.title, entry["size"], entry["sha256"]
+                )
+            self._set_status(job, FINISHED)
@@ -0,0 +1,499 @@
+import importlib.util
+import math
+import os
+import re
+import threading
+from array import array
+from collections import defaultdict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from salary_sketch import SalaryDistribution
+
+# =============================
+# CONFIG
+# =============================
+# Set EMPLOYEE_FILE to a CSV path to keep employees across restarts
+EMPLOYEE_FILE = os.environ.get("EMPLOYEE_FILE")
+
+SEED_EMPLOYEES = {
+    "Employee ID": [1001, 1002, 1003, 1004, 1005],
+    "Name": ["Ravi Kumar", "Anjali Sharma", "Suresh Reddy", "Meena Patel", "Arjun Singh"],
+    "Department": ["IT", "HR", "Finance", "IT", "Marketing"],
+    "Role": ["Software Engineer", "HR Manager", "Accountant", "QA Engineer", "Marketing Executive"],
+    "Salary": [75000, 65000, 60000, 55000, 50000],
+    "Date Joined": ["2021-06-01", "2020-08-15", "2019-03-10", "2022-01-05", "2023-07-12"]
+}
+
+EMPLOYEE_COLUMNS = list(SEED_EMPLOYEES)
+DEPARTMENTS = ["IT", "HR", "Finance", "Marketing", "Operations"]
+# Rows read and validated at a time during a bulk import
+IMPORT_CHUNKSIZE = 50_000
+
+# Compact in-memory schema, enforced on load and on every insert.
+# Department and Role repeat across employees, so they are stored once as
+# categories plus small integer codes per row; groupbys run on the codes.
+EMPLOYEE_SCHEMA = {
+    "Employee ID": "int32",
+    "Name": "object",
+    "Department": "category",
+    "Role": "category",
+    "Salary": "int32",
+    "Date Joined": "datetime64[ns]",
+}
+INT32_MAX = np.iinfo(np.int32).max
+
+# Columns covered by the directory search, and the n-gram length indexed
+SEARCH_FIELDS = ["Name", "Department", "Role"]
+NGRAM = 3
+# Search texts are kept in Arrow-backed strings when pyarrow is installed,
+# so substring and prefix checks run as vectorized kernels
+SEARCH_TEXT_DTYPE = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "string"
+
+Snapshot = namedtuple("Snapshot", ["version", "employees", "aggregates", "distribution"])
+
+
+# =============================
+# RUNNING AGGREGATES
+# =============================
+class EmployeeAggregates:
+    """Running count, sum and sum of squares of Salary.
+
+    Kept per department, per role and overall, so headcounts, means and
+    standard deviations are read off without a groupby. `updated` returns
+    a new object for the next snapshot; published ones are never changed.
+    """
+
+    def __init__(self, by_department=None, by_role=None, total=None):
+        self.by_department = by_department or {}
+        self.by_role = by_role or {}
+        self.total = total or [0, 0, 0]
+
+    @classmethod
+    def from_frame(cls, employees):
+        return cls().updated(employees)
+
+    def updated(self, rows):
+        """A copy with `rows` added; cost depends on len(rows), not the table."""
+        # Shallow copies; only the touched groups get new accumulators
+        by_department, by_role = dict(self.by_department), dict(self.by_role)
+        total = list(self.total)
+        for department, role, salary in zip(rows["Department"], rows["Role"], rows["Salary"]):
+            salary = int(salary)
+            by_department[department] = dept_acc = list(by_department.get(department, (0, 0, 0)))
+            by_role[role] = role_acc = list(by_role.get(role, (0, 0, 0)))
+            for acc in (dept_acc, role_acc, total):
+                acc[0] += 1
+                acc[1] += salary
+                acc[2] += salary * salary
+        return EmployeeAggregates(by_department, by_role, total)
+
+    @staticmethod
+    def _mean(acc):
+        return acc[1] / acc[0] if acc[0] else 0.0
+
+    @staticmethod
+    def _std(acc):
+        # Sample standard deviation, as pandas reports it
+        if acc[0] < 2:
+            return float("nan")
+        return math.sqrt(max(acc[2] - acc[1] * acc[1] / acc[0], 0) / (acc[0] - 1))
+
+    def total_count(self):
+        return self.total[0]
+
+    def mean_salary(self):
+        return self._mean(self.total)
+
+    def department_count(self):
+        return len(self.by_department)
+
+    @metrics.timed("employees.department_counts")
+    def department_counts(self):
+        """Headcount per department, largest first (like value_counts)."""
+        counts = pd.Series({k: v[0] for k, v in self.by_department.items()}, dtype="int64")
+        return counts.sort_values(ascending=False)
+
+    @metrics.timed("employees.department_summary")
+    def department_summary(self):
+        summary = pd.DataFrame(
+            [
+                (department, acc[0], self._mean(acc), self._std(acc))
+                for department, acc in self.by_department.items()
+            ],
+            columns=["Department", "Employee Count", "Avg Salary", "Salary Std Dev"],
+        )
+        return summary.set_index("Department").sort_index()
+
+    @metrics.timed("employees.role_mean_salary")
+    def role_mean_salary(self):
+        means = pd.Series({k: self._mean(v) for k, v in self.by_role.items()}, dtype="float64")
+        return means.rename_axis("Role").sort_values(ascending=False)
+
+
+# =============================
+# SEARCH INDEX
+# =============================
+class EmployeeSearchIndex:
+    """Trigram postings over the lowercase Name/Department/Role of each row.
+
+    Rows are only ever appended, so postings hold increasing row positions
+    and a snapshot of length n simply ignores positions >= n. A query
+    intersects the postings of its trigrams, smallest first, and confirms
+    the candidates with one vectorized substring test over the texts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Lowercase texts per add(), joined into one Series on the next search
+        self._chunks = []
+        self._texts = None
+        self._size = 0
+        self._postings = defaultdict(lambda: array("i"))
+
+    def add(self, frame):
+        """Index the rows of `frame`, which follow the rows already indexed."""
+        texts = frame[SEARCH_FIELDS[0]].astype(str).str.lower()
+        for field in SEARCH_FIELDS[1:]:
+            # The separator keeps matches from spanning two fields
+            texts = texts + "\x1f" + frame[field].astype(str).str.lower()
+        texts = texts.astype(SEARCH_TEXT_DTYPE).reset_index(drop=True)
+        with self._lock:
+            for pos, text in enumerate(texts, start=self._size):
+                for gram in {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}:
+                    self._postings[gram].append(pos)
+            self._size += len(texts)
+            self._chunks.append(texts)
+            self._texts = None
+
+    def _all_texts(self):
+        if self._texts is None:
+            self._texts = pd.concat(self._chunks, ignore_index=True)
+            self._chunks = [self._texts]
+        return self._texts
+
+    def search(self, query, size, rank=False):
+        """Positions (< size) of rows whose fields contain `query`.
+
+        With `rank`, rows whose name starts with the query come first, then
+        rows where any word starts with it, then the remaining matches.
+        """
+        q = query.strip().lower()
+        with self._lock:
+            if not q:
+                return np.arange(size)
+            texts = self._all_texts()
+            if len(q) < NGRAM:
+                # Too short to have a trigram: scan the lowercase texts
+                matched = texts.iloc[:size].str.contains(q, regex=False)
+                hits = np.flatnonzero(matched.to_numpy(dtype=bool))
+            else:
+                grams = {q[i:i + NGRAM] for i in range(len(q) - NGRAM + 1)}
+                if any(gram not in self._postings for gram in grams):
+                    return np.empty(0, dtype=np.int64)
+                lists = sorted((self._postings[gram] for gram in grams), key=len)
+                candidates = np.frombuffer(lists[0], dtype=np.int32).copy()
+                mark = None
+                for postings in lists[1:]:
+                    if not len(candidates):
+                        break
+                    postings = np.frombuffer(postings, dtype=np.int32)
+                    if len(candidates) * 16 < len(postings):
+                        # Few candidates: binary-search them in the sorted list
+                        at = np.searchsorted(postings, candidates)
+                        at[at == len(postings)] = 0
+                        candidates = candidates[postings[at] == candidates]
+                    else:
+                        # Otherwise mark the list's rows and test each candidate
+                        if mark is None:
+                            mark = np.zeros(self._size, dtype=bool)
+                        mark[postings] = True
+                        candidates = candidates[mark[candidates]]
+                        mark[postings] = False
+                candidates = candidates[candidates < size].astype(np.int64)
+                matched = texts.take(candidates).str.contains(q, regex=False)
+                hits = candidates[matched.to_numpy(dtype=bool)]
+
+            if rank and len(hits):
+                found = texts.take(hits)
+                name_prefix = found.str.startswith(q).to_numpy(dtype=bool)
+                # A word starts after whitespace or the field separator
+                word_prefix = found.str.contains("[\\s\x1f]" + re.escape(q)).to_numpy(dtype=bool)
+                scores = np.where(name_prefix, 0, np.where(word_prefix, 1, 2))
+                hits = hits[np.argsort(scores, kind="stable")]
+        return hits
+
+
+# =============================
+# SCHEMA
+# =============================
+def apply_employee_schema(df, like=None):
+    """Cast `df` to EMPLOYEE_SCHEMA.
+
+    Category lists start with those of `like` (the current table) and
+    append any new values, so existing codes stay valid and the two
+    frames can be concatenated without falling back to object dtype.
+    Raises ValueError if an int32 column holds a value outside
+    0..INT32_MAX, which a plain cast would silently wrap.
+    """
+    columns = {}
+    for col, dtype in EMPLOYEE_SCHEMA.items():
+        values = df[col]
+        if dtype == "category":
+            if like is not None:
+                base = list(like[col].cat.categories)
+            else:
+                base = DEPARTMENTS if col == "Department" else []
+            values = values.astype(str)
+            known = set(base)
+            new = [v for v in pd.unique(values) if v not in known]
+            values = pd.Categorical(values, categories=base + new)
+        elif dtype == "datetime64[ns]":
+            # to_datetime picks its own unit (us on pandas 3); pin it
+            values = pd.to_datetime(values).astype(dtype)
+        elif dtype == "int32":
+            numeric = pd.to_numeric(values)
+            if ((numeric < 0) | (numeric > INT32_MAX)).any():
+                raise ValueError(f"{col} must be between 0 and {INT32_MAX}")
+            values = numeric.astype(dtype)
+        else:
+            values = values.astype(dtype)
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def memory_report(employees):
+    """Bytes per column of the compact table vs plain object/int64 columns."""
+    plain = employees.astype({
+        "Employee ID": "int64",
+        "Department": object,
+        "Role": object,
+        "Salary": "int64",
+    }).assign(**{"Date Joined": employees["Date Joined"].dt.strftime("%Y-%m-%d")})
+    report = pd.DataFrame({
+        "Plain (bytes)": plain.memory_usage(deep=True, index=False),
+        "Compact (bytes)": employees.memory_usage(deep=True, index=False),
+    })
+    report.loc["Total"] = report.sum()
+    return report
+
+
+# =============================
+# BULK IMPORT
+# =============================
+def read_import_chunks(file, filename, chunksize=IMPORT_CHUNKSIZE):
+    """Yield an uploaded CSV or Parquet file as frames of text columns."""
+    if filename.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas().astype(str)
+    else:
+        yield from pd.read_csv(file, dtype=str, chunksize=chunksize)
+
+
+def validate_employees(chunk):
+    """Split a chunk into typed valid rows and rejected rows with a Reason.
+
+    All checks are column-wide; no row is inspected in Python.
+    """
+    missing = [col for col in EMPLOYEE_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Upload is missing columns: {', '.join(missing)}")
+    chunk = chunk[EMPLOYEE_COLUMNS]
+
+    emp_id = pd.to_numeric(chunk["Employee ID"], errors="coerce")
+    salary = pd.to_numeric(chunk["Salary"], errors="coerce")
+    joined = pd.to_datetime(chunk["Date Joined"], errors="coerce")
+    name = chunk["Name"].astype(str).str.strip()
+    role = chunk["Role"].astype(str).str.strip()
+
+    reason = pd.Series("", index=chunk.index, dtype=object)
+    reason[joined.isna()] = "Invalid join date"
+    reason[~chunk["Department"].isin(DEPARTMENTS)] = "Unknown department"
+    reason[salary.isna() | (salary < 0) | (salary > INT32_MAX) | (salary % 1 != 0)] = "Invalid salary"
+    reason[role.isin(["", "nan", "None"])] = "Missing role"
+    reason[name.isin(["", "nan", "None"])] = "Missing name"
+    reason[emp_id.isna() | (emp_id < 0) | (emp_id > INT32_MAX) | (emp_id % 1 != 0)] = "Invalid employee ID"
+
+    ok = reason == ""
+    valid = pd.DataFrame({
+        "Employee ID": emp_id[ok].astype("int64"),
+        "Name": name[ok],
+        "Department": chunk["Department"][ok],
+        "Role": role[ok],
+        "Salary": salary[ok].astype("int64"),
+        "Date Joined": joined[ok],
+    })
+    rejected = chunk[~ok].assign(Reason=reason[~ok])
+    return valid, rejected
+
+
+# =============================
+# SHARED EMPLOYEE STORE
+# =============================
+class EmployeeStore:
+    """One employee table per process, published as versioned snapshots.
+
+    Readers get the current DataFrame itself, not a copy. Writers never
+    modify a published frame: they build a new one and publish it under
+    the next version, so a snapshot a session holds stays consistent.
+    Snapshots must therefore be treated as read-only.
+    """
+
+    def __init__(self, path=EMPLOYEE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        employees = self._load()
+        self._search = EmployeeSearchIndex()
+        self._search.add(employees)
+        # Hash index of Employee IDs, so uniqueness is checked per row in O(1)
+        self._ids = set(employees["Employee ID"].tolist())
+        # {(version, column): row positions in ascending column order}
+        self._orders = {}
+        self._snapshot = Snapshot(
+            0,
+            employees,
+            EmployeeAggregates.from_frame(employees),
+            SalaryDistribution.from_frame(employees),
+        )
+
+    def _load(self):
+        if self.path and os.path.exists(self.path):
+            return apply_employee_schema(pd.read_csv(self.path))
+        employees = apply_employee_schema(pd.DataFrame(SEED_EMPLOYEES))
+        if self.path:
+            employees.to_csv(self.path, index=False)
+        return employees
+
+    def snapshot(self):
+        return self._snapshot
+
+    def _known(self, ids):
+        return np.fromiter((i in self._ids for i in ids), dtype=bool, count=len(ids))
+
+    @metrics.timed("employees.add")
+    def add(self, rows):
+        """Append the rows of a DataFrame and publish a new version.
+
+        Raises ValueError if an Employee ID repeats or already exists.
+        """
+        rows = rows[EMPLOYEE_COLUMNS]
+        with self._lock:
+            if rows["Employee ID"].duplicated().any() or self._known(rows["Employee ID"]).any():
+                raise ValueError("Employee ID already exists")
+            current = self._snapshot
+            rows = apply_employee_schema(rows, like=current.employees)
+            existing = current.employees
+            for col in ("Department", "Role"):
+                if len(rows[col].cat.categories) > len(existing[col].cat.categories):
+                    # New values were appended, so existing codes are unchanged
+                    existing = existing.assign(
+                        **{col: existing[col].cat.set_categories(rows[col].cat.categories)}
+                    )
+            employees = pd.concat([existing, rows], ignore_index=True)
+            if self.path:
+                rows.to_csv(self.path, mode="a", header=False, index=False)
+            self._search.add(rows)
+            self._ids.update(rows["Employee ID"].tolist())
+            self._snapshot = Snapshot(
+                current.version + 1,
+                employees,
+                current.aggregates.updated(rows),
+                current.distribution.updated(rows),
+            )
+            return self._snapshot
+
+    @metrics.timed("employees.import")
+    def import_employees(self, chunks):
+        """Validate streamed chunks and append every accepted row at once.
+
+        Returns (number of rows added, rejected rows with a Reason column).
+        """
+        accepted, rejected, seen = [], [], set()
+        for chunk in chunks:
+            valid, bad = validate_employees(chunk)
+            ids = valid["Employee ID"]
+            duplicate = (
+                self._known(ids)
+                | np.fromiter((i in seen for i in ids), dtype=bool, count=len(ids))
+                | ids.duplicated().to_numpy()
+            )
+            seen.update(ids[~duplicate].tolist())
+            accepted.append(valid[~duplicate])
+            rejected.append(bad)
+            rejected.append(
+                chunk.loc[valid.index[duplicate], EMPLOYEE_COLUMNS].assign(Reason="Duplicate employee ID")
+            )
+
+        added = pd.concat(accepted, ignore_index=True) if accepted else None
+        if added is not None and len(added):
+            self.add(added)
+        rejected = pd.concat(rejected) if rejected else pd.DataFrame(columns=EMPLOYEE_COLUMNS + ["Reason"])
+        return (0 if added is None else len(added)), rejected
+
+    @metrics.timed("employees.search")
+    def search(self, query, snapshot, rank=False):
+        """Row positions in `snapshot.employees` matching `query`."""
+        return self._search.search(query, len(snapshot.employees), rank=rank)
+
+    def sort_order(self, snapshot, column):
+        """Row positions of `snapshot` sorted by `column`, computed once per version."""
+        key = (snapshot.version, column)
+        with self._lock:
+            order = self._orders.get(key)
+        if order is None:
+            values = snapshot.employees[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Sort the integer codes by each category's alphabetical rank
+                categories = values.cat.categories.to_numpy()
+                rank = np.empty(len(categories), dtype=np.int64)
+                rank[np.argsort(categories, kind="stable")] = np.arange(len(categories))
+                codes = values.cat.codes.to_numpy()
+                keys = np.where(codes >= 0, rank[codes], len(categories))
+                order = np.argsort(keys, kind="stable")
+            else:
+                order = values.argsort(kind="stable").to_numpy()
+            with self._lock:
+                # Orders of older versions are no longer needed
+                self._orders = {k: v for k, v in self._orders.items() if k[0] == snapshot.version}
+                self._orders[key] = order
+        return order
+
+    @metrics.timed("employees.page")
+    def page(self, snapshot, column, ascending=True, page=0, page_size=50, positions=None):
+        """One page of the directory, sorted by `column`.
+
+        `positions` restricts the directory to those rows (e.g. search
+        hits); with `column` None they are shown in the order given. Only
+        the rows on the requested page are materialised. Returns (page
+        frame, number of matching rows).
+        """
+        if column is None:
+            order = positions
+        else:
+            order = self.sort_order(snapshot, column)
+        if not ascending:
+            order = order[::-1]
+        if column is not None and positions is not None:
+            keep = np.zeros(len(snapshot.employees), dtype=bool)
+            keep[positions] = True
+            order = order[keep[order]]
+        start = page * page_size
+        return snapshot.employees.take(order[start:start + page_size]), len(order)
+
+
+# Held in this imported module so every dashboard session in the process
+# shares one store and sees the others' changes.
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_employee_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EmployeeStore()
+        return _store
@@ -0,0 +1,201 @@
+"""Hot-path timing histograms for the Streamlit apps.
+
+Set CITY_METRICS=1 to enable. Wrap a function with `@timed("op")` or a
+block with `with timer("op"):`; durations are aggregated in memory into
+one Prometheus histogram labelled by op. Each app calls `export(app)` at
+the end of a run, which writes the text exposition format to
+CITY_METRICS_DIR/<app>.prom (at most every EXPORT_INTERVAL seconds) and,
+when CITY_METRICS_PORT is set, serves it at http://host:port/metrics.
+
+When disabled `timed` returns the function unchanged and `timer` returns
+a shared no-op context, so instrumented code pays nothing.
+"""
+import bisect
+import os
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =============================
+# CONFIG
+# =============================
+ENABLED = os.environ.get("CITY_METRICS", "") not in ("", "0")
+METRICS_DIR = os.environ.get("CITY_METRICS_DIR", "metrics")
+METRICS_PORT = int(os.environ.get("CITY_METRICS_PORT", "0") or 0)
+# Minimum seconds between two writes of the .prom file
+EXPORT_INTERVAL = 5
+METRIC_NAME = "city_hot_path_seconds"
+# Prometheus defaults plus a few long buckets for downloads
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+# =============================
+# HISTOGRAMS
+# =============================
+class Histogram:
+    """Bucket counts, sum and count of observed durations for one op."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def state(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def observe(op, seconds):
+    """Record one duration for `op`."""
+    histogram = _histograms.get(op)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(op, Histogram())
+    histogram.observe(seconds)
+
+
+# =============================
+# INSTRUMENTATION
+# =============================
+class _Timer:
+    __slots__ = ("op", "start")
+
+    def __init__(self, op):
+        self.op = op
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.op, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(op):
+    """Context manager that records the duration of its block under `op`."""
+    return _Timer(op) if ENABLED else _NULL_TIMER
+
+
+def timed(op):
+    """Decorator that records every call's duration (including raises) under `op`."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(op, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+# =============================
+# EXPORT
+# =============================
+def render():
+    """All histograms in the Prometheus text exposition format."""
+    lines = [
+        f"# HELP {METRIC_NAME} Duration of instrumented hot-path operations.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    for op, histogram in items:
+        counts, total, count = histogram.state()
+        cumulative = 0
+        for bound, c in zip(histogram.buckets + ("+Inf",), counts):
+            cumulative += c
+            lines.append(f'{METRIC_NAME}_bucket{{op="{op}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{op="{op}"}} {total:.6f}')
+        lines.append(f'{METRIC_NAME}_count{{op="{op}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_last_export = {}
+_export_lock = threading.Lock()
+
+
+def start_http_server(port=METRICS_PORT):
+    """Serve /metrics on `port` from a daemon thread, once per process."""
+    global _server
+    with _export_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(("", port), _MetricsHandler)
+        except OSError:
+            # Port taken, e.g. by another app on this host; the file export still works.
+            _server = False
+            return _server
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
+
+
+def export(app):
+    """Write CITY_METRICS_DIR/<app>.prom and start the HTTP endpoint if configured."""
+    if not ENABLED:
+        return
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+
+    now = time.monotonic()
+    with _export_lock:
+        if now - _last_export.get(app, float("-inf")) < EXPORT_INTERVAL:
+            return
+        _last_export[app] = now
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{app}.prom")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", newline="\n") as f:
+        f.write(render())
+    # Readers (e.g. a node_exporter textfile collector) never see a partial file
+    os.replace(tmp, path)
@@ -0,0 +1,79 @@
+"""Import and rerun-time profiling for the Streamlit apps.
+
+Set CITY_PROFILE=1 to enable. Import this module first in a script so it
+can time the heavy imports that follow, call `start_rerun()` at the top
+of the script, `checkpoint(name)` after each section and `render_report()`
+at the end. When disabled every call returns immediately.
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+
+# =============================
+# CONFIG
+# =============================
+ENABLED = os.environ.get("CITY_PROFILE", "") not in ("", "0")
+
+# {module name: seconds for its first import, including its own imports}
+IMPORT_TIMES = {}
+
+_local = threading.local()
+_original_import = builtins.__import__
+
+
+# =============================
+# IMPORT TIMING
+# =============================
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+
+
+if ENABLED:
+    builtins.__import__ = _timed_import
+
+
+# =============================
+# RERUN SECTIONS
+# =============================
+def start_rerun():
+    """Begin timing one script run (each session runs in its own thread)."""
+    if ENABLED:
+        _local.sections = []
+        _local.last = _local.start = time.perf_counter()
+
+
+def checkpoint(name):
+    """Record the time since the previous checkpoint under `name`."""
+    if ENABLED and hasattr(_local, "last"):
+        now = time.perf_counter()
+        _local.sections.append((name, now - _local.last))
+        _local.last = now
+
+
+def render_report():
+    """Show import and section timings in a sidebar expander."""
+    if not ENABLED or not hasattr(_local, "start"):
+        return
+    import streamlit as st
+
+    total = time.perf_counter() - _local.start
+    with st.sidebar.expander("⏱ Profiling"):
+        st.caption(f"This run: {total * 1000:.1f} ms")
+        st.table({
+            "Section": [name for name, _ in _local.sections],
+            "ms": [round(dt * 1000, 2) for _, dt in _local.sections],
+        })
+        slowest = sorted(IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True)[:15]
+        st.caption("Slowest first-time imports in this process")
+        st.table({
+            "Module": [name for name, _ in slowest],
+            "ms": [round(dt * 1000, 2) for _, dt in slowest],
+        })
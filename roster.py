@@ -0,0 +1,164 @@
+import csv
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+# ---------------- CONFIG ----------------
+# RollNo,PasswordHash[,Role] CSV, or an SQLite file (.db) with a students
+# table and an optional faculty (Username, PasswordHash) table
+ROSTER_FILE = os.environ.get("ROSTER_FILE", "roster.csv")
+HASH_ITERATIONS = 200_000
+# Logins remembered after a successful password check
+VERIFY_CACHE_SIZE = 10_000
+
+# Demo students (RollNo : Password), used only when there is no roster file.
+# Faculty accounts only come from a roster file.
+STUDENTS = {
+    "101": "city101",
+    "102": "city102",
+    "103": "city103"
+}
+STUDENT, FACULTY = "student", "faculty"
+
+
+# ---------------- PASSWORD HASHING ----------------
+def hash_password(password, salt=None, iterations=HASH_ITERATIONS):
+    """Return 'pbkdf2_sha256$<iterations>$<salt>$<hash>' for `password`."""
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations)
+    return f"pbkdf2_sha256${iterations}${salt}${digest.hex()}"
+
+
+def check_password(password, encoded):
+    _, iterations, salt, expected = encoded.split("$")
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+def write_roster(path, students, faculty=None, iterations=HASH_ITERATIONS):
+    """Write {RollNo: password} and {Username: password} as a hashed roster CSV."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["RollNo", "PasswordHash", "Role"])
+        for role, accounts in ((STUDENT, students), (FACULTY, faculty or {})):
+            for name, password in accounts.items():
+                writer.writerow([name, hash_password(password, iterations=iterations), role])
+
+
+# ---------------- ROSTER STORE ----------------
+class RosterStore:
+    """Salted password hashes per role (student RollNo, faculty username),
+    loaded once per process.
+
+    Lookups are a dict access. PBKDF2 is deliberately slow, so successful
+    checks are remembered in a bounded LRU keyed by an HMAC of the password
+    under a per-process secret; a session that logs in again skips the
+    hash, and no plaintext is kept.
+    """
+
+    def __init__(self, path=ROSTER_FILE, cache_size=VERIFY_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._hashes = None
+        self._lock = threading.Lock()
+        self._verified = OrderedDict()
+        self._secret = secrets.token_bytes(32)
+
+    def _load(self):
+        hashes = {STUDENT: {}, FACULTY: {}}
+        if not os.path.exists(self.path):
+            hashes[STUDENT] = {roll: hash_password(pw) for roll, pw in STUDENTS.items()}
+        elif self.path.endswith((".db", ".sqlite")):
+            conn = sqlite3.connect(self.path)
+            try:
+                hashes[STUDENT] = dict(conn.execute("SELECT RollNo, PasswordHash FROM students"))
+                has_faculty = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'faculty'"
+                ).fetchone()
+                if has_faculty:
+                    hashes[FACULTY] = dict(conn.execute("SELECT Username, PasswordHash FROM faculty"))
+            finally:
+                conn.close()
+        else:
+            with open(self.path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    # Rosters written before the Role column are all students
+                    role = row.get("Role") or STUDENT
+                    hashes.setdefault(role, {})[row["RollNo"]] = row["PasswordHash"]
+        return hashes
+
+    def _entries(self, role=STUDENT):
+        with self._lock:
+            if self._hashes is None:
+                self._hashes = self._load()
+            return self._hashes.get(role, {})
+
+    def __len__(self):
+        return len(self._entries())
+
+    def verify(self, roll, password, role=STUDENT):
+        encoded = self._entries(role).get(roll)
+        if encoded is None:
+            return False
+
+        token = hmac.new(self._secret, password.encode(), hashlib.sha256).digest()
+        key = (role, roll, token)
+        with self._lock:
+            # Keyed on the stored hash too, so a changed password is rechecked
+            if self._verified.get(key) == encoded:
+                self._verified.move_to_end(key)
+                return True
+
+        if not check_password(password, encoded):
+            return False
+        with self._lock:
+            self._verified[key] = encoded
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return True
+
+
+# Held in this imported module so the roster is loaded once per process
+_roster = None
+_roster_lock = threading.Lock()
+
+
+def get_roster():
+    global _roster
+    with _roster_lock:
+        if _roster is None:
+            _roster = RosterStore()
+        return _roster
+
+
+def set_roster(store):
+    global _roster
+    with _roster_lock:
+        _roster = store
+
+
+# ---------------- FUNCTIONS ----------------
+def authenticate(roll, password):
+    return get_roster().verify(roll, password)
+
+
+def authenticate_faculty(username, password):
+    return get_roster().verify(username, password, role=FACULTY)
+
+
+if __name__ == "__main__":
+    # python roster.py accounts.csv roster.csv
+    # Hashes a RollNo,Password[,Role] CSV into a roster file; rows with
+    # Role "faculty" are faculty logins, with the username in RollNo.
+    src, dest = sys.argv[1], sys.argv[2]
+    plain = {STUDENT: {}, FACULTY: {}}
+    with open(src, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            plain[row.get("Role") or STUDENT][row["RollNo"]] = row["Password"]
+    write_roster(dest, plain[STUDENT], plain[FACULTY])
+    print(f"Wrote {len(plain[STUDENT])} students and {len(plain[FACULTY])} faculty to {dest}")
@@ -0,0 +1,166 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# =============================
+# CONFIG
+# =============================
+# Relative error of sketched quantiles (1% of the true value)
+SKETCH_ACCURACY = 0.01
+# Width of the fixed salary histogram bins, in INR
+HISTOGRAM_BIN_WIDTH = 10_000
+QUANTILES = [0.5, 0.9, 0.99]
+
+
+# =============================
+# QUANTILE SKETCH
+# =============================
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded relative error.
+
+    Positive values are counted in logarithmic buckets (value v goes to
+    bucket ceil(log_gamma(v))), so any quantile is within `accuracy` of
+    the true value. Memory grows with the range of salaries, not with
+    the number of employees. Two sketches merge by adding bucket counts.
+    """
+
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+
+    def copy(self):
+        other = QuantileSketch(self.accuracy)
+        other.buckets = dict(self.buckets)
+        other.zeros = self.zeros
+        other.count = self.count
+        return other
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        self.count += len(values)
+        if len(positive):
+            index, counts = np.unique(
+                np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+                return_counts=True,
+            )
+            for i, c in zip(index.tolist(), counts.tolist()):
+                self.buckets[i] = self.buckets.get(i, 0) + c
+
+    def merge(self, other):
+        merged = self.copy()
+        for i, c in other.buckets.items():
+            merged.buckets[i] = merged.buckets.get(i, 0) + c
+        merged.zeros += other.zeros
+        merged.count += other.count
+        return merged
+
+    def quantile(self, q):
+        """Value at rank floor(q * (n - 1)), like np.quantile(method="lower")."""
+        if not self.count:
+            return float("nan")
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen > rank:
+                # Midpoint of (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** i / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+# =============================
+# SALARY DISTRIBUTION
+# =============================
+class SalaryDistribution:
+    """Quantile sketch and fixed-bin histogram of Salary per department.
+
+    Follows EmployeeAggregates: `updated` returns a new object in which
+    only the departments touched by the new rows are copied.
+    """
+
+    def __init__(self, sketches=None, histograms=None):
+        self.sketches = sketches or {}
+        self.histograms = histograms or {}
+
+    @classmethod
+    def from_frame(cls, employees):
+        return cls().updated(employees)
+
+    def updated(self, rows):
+        sketches, histograms = dict(self.sketches), dict(self.histograms)
+        salaries = rows["Salary"].to_numpy()
+        departments = rows["Department"].astype(str).to_numpy()
+        for department in pd.unique(departments):
+            values = salaries[departments == department]
+            sketch = sketches.get(department) or QuantileSketch()
+            sketch = sketch.copy()
+            sketch.add_many(values)
+            sketches[department] = sketch
+
+            histogram = dict(histograms.get(department, {}))
+            bins, counts = np.unique(values // HISTOGRAM_BIN_WIDTH, return_counts=True)
+            for b, c in zip(bins.tolist(), counts.tolist()):
+                histogram[b] = histogram.get(b, 0) + c
+            histograms[department] = histogram
+        return SalaryDistribution(sketches, histograms)
+
+    def departments(self):
+        return sorted(self.sketches)
+
+    @metrics.timed("salary.sketch_quantiles")
+    def quantiles(self, qs=QUANTILES):
+        """Approximate quantiles per department plus an "All" row."""
+        rows = {d: [self.sketches[d].quantile(q) for q in qs] for d in self.departments()}
+        if self.sketches:
+            merged = QuantileSketch()
+            for sketch in self.sketches.values():
+                merged = merged.merge(sketch)
+            rows["All"] = [merged.quantile(q) for q in qs]
+        return _quantile_table(rows, qs)
+
+    def histogram(self, department=None):
+        """Employee count per salary bin (indexed by bin start)."""
+        counts = {}
+        for d, histogram in self.histograms.items():
+            if department is None or d == department:
+                for b, c in histogram.items():
+                    counts[b] = counts.get(b, 0) + c
+        hist = pd.Series(counts, dtype="int64").sort_index()
+        hist.index = hist.index * HISTOGRAM_BIN_WIDTH
+        return hist.rename_axis("Salary From")
+
+
+@metrics.timed("salary.exact_quantiles")
+def exact_quantiles(employees, qs=QUANTILES):
+    """Exact quantiles per department plus "All", computed on demand.
+
+    Uses the same rank definition as QuantileSketch.quantile: the element
+    at rank floor(q * (n - 1)), with no interpolation between elements.
+    """
+    salaries = employees["Salary"].to_numpy()
+    codes = employees["Department"].cat.codes.to_numpy()
+    categories = employees["Department"].cat.categories
+    rows = {}
+    for code in np.unique(codes[codes >= 0]):
+        rows[categories[code]] = np.quantile(salaries[codes == code], qs, method="lower").tolist()
+    rows = dict(sorted(rows.items()))
+    if len(salaries):
+        rows["All"] = np.quantile(salaries, qs, method="lower").tolist()
+    return _quantile_table(rows, qs)
+
+
+def _quantile_table(rows, qs):
+    columns = [f"p{round(q * 100)}" for q in qs]
+    table = pd.DataFrame.from_dict(rows, orient="index", columns=columns)
+    return table.round(0).rename_axis("Department")
@@ -0,0 +1,201 @@
+import os
+from datetime import date
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+import attendance_store
+from attendance_store import FULL_COLUMNS, CsvAttendanceStore
+
+MIXED_LOG = (
+    "RollNo,Name,Date,In Time,Out Time,Status\n"
+    # October: check-in export rows, Status never filled in
+    "101,Ravi,2025-10-03,09:00:00,16:00:00,\n"
+    "102,Asha,2025-10-03,09:05:00,16:00:00,\n"
+    # November/December: marks from the app, only Status filled in
+    "101,,2025-11-04,,,Present\n"
+    "102,,2025-12-01,,,Absent\n"
+    # current month, stays in the log
+    "101,,2026-01-05,,,Present\n"
+)
+
+
+def statuses(frame):
+    return [s if isinstance(s, str) else None for s in frame["Status"].tolist()]
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "attendance.csv"
+    path.write_text(MIXED_LOG)
+    return CsvAttendanceStore(str(path), str(tmp_path / "archive"))
+
+
+def test_compact_writes_every_column_as_text(store):
+    assert store.compact(date(2026, 1, 10)) == 4
+    for root, _, files in os.walk(store.archive_dir):
+        for name in files:
+            schema = pq.read_schema(os.path.join(root, name))
+            assert all(t == pa.string() for t in schema.types), schema
+
+
+def test_mixed_null_partitions_stay_readable(store):
+    store.compact(date(2026, 1, 10))
+
+    assert len(store._read_archive()) == 4
+    rows, _, replaced = store.read_hot()
+    assert replaced and len(rows) == 1
+    records = attendance_store.AttendanceView().records(store, "101")
+    assert statuses(records) == [None, "Present", "Present"]
+
+    fresh = CsvAttendanceStore(store.path, store.archive_dir)
+    assert fresh.mark("103", "2026-01-06", "Present") is True
+    assert fresh.mark("101", "2025-11-04", "Absent") is False
+
+
+def test_reads_parts_with_null_typed_columns(store):
+    # Parts written before the schema fix: an all-empty month is `null`
+    def write(month, status):
+        part_dir = os.path.join(store.archive_dir, "year=2025", f"month={month}")
+        os.makedirs(part_dir)
+        table = pa.table({
+            "RollNo": ["101"], "Name": pa.array([None], pa.null()),
+            "Date": [f"2025-{month}-01"], "In Time": pa.array([None], pa.null()),
+            "Out Time": pa.array([None], pa.null()), "Status": status,
+        })
+        pq.write_table(table, os.path.join(part_dir, "part-0.parquet"))
+
+    write("10", pa.array([None], pa.null()))
+    write("11", pa.array(["Present"]))
+
+    archived = store.archived_records("101", columns=FULL_COLUMNS)
+    assert statuses(archived) == [None, "Present"]
+
+
+def test_view_tails_the_log_and_keeps_archived_rows(store, monkeypatch):
+    store.compact(date(2026, 1, 10))
+    view = attendance_store.AttendanceView()
+    assert statuses(view.records(store, "101")) == [None, "Present", "Present"]
+    before_102 = view.records(store, "102")
+
+    archive_reads = []
+    archived_records = store.archived_records
+    monkeypatch.setattr(store, "archived_records", lambda roll, columns=None: (
+        archive_reads.append(roll) or archived_records(roll, columns)
+    ))
+    store.mark("101", "2026-01-06", "Absent")
+    store.mark("103", "2026-01-06", "Present")
+
+    assert statuses(view.records(store, "101")) == [None, "Present", "Present", "Absent"]
+    assert view.records(store, "102") is before_102
+    assert statuses(view.records(store, "103")) == ["Present"]
+    # Only the student seen for the first time reads the archive
+    assert archive_reads == ["103"]
+
+    # A half-written row from another process waits for its newline
+    with open(store.path, "a") as f:
+        f.write("104,,2026-01-07,,,Pre")
+    assert len(view.records(store, "104")) == 0
+    with open(store.path, "a") as f:
+        f.write("sent\n")
+    assert statuses(view.records(store, "104")) == ["Present"]
+
+    # Compaction replaces the log, so everything is read again
+    store.compact(date(2026, 2, 10))
+    assert statuses(view.records(store, "101")) == [None, "Present", "Present", "Absent"]
+    assert "101" in archive_reads
+
+
+def test_sqlite_view_reads_one_student_per_query(tmp_path):
+    store = attendance_store.SqliteAttendanceStore(str(tmp_path / "a.db"), migrate_from=None)
+    store.init()
+    store.mark("101", "2026-01-05", "Present")
+    view = attendance_store.AttendanceView()
+    assert statuses(view.records(store, "101")) == ["Present"]
+
+    # The store has no whole-table load; each student is one indexed query
+    assert not hasattr(store, "read_hot")
+    store.mark("102", "2026-01-05", "Absent")
+    store.mark("101", "2026-01-06", "Absent")
+    assert statuses(view.records(store, "101")) == ["Present", "Absent"]
+    assert statuses(view.records(store, "102")) == ["Absent"]
+
+
+def test_bulk_marks_skip_recorded_keys(store):
+    store.compact(date(2026, 1, 10))
+    attendance_store.set_store(store)
+    try:
+        accepted, rejected = attendance_store.mark_attendance_bulk([
+            ("101", "2025-11-04", "Absent"),   # archived
+            ("101", "2026-01-05", "Absent"),   # in the log
+            ("103", "2026-01-05", "Present"),
+        ])
+    finally:
+        attendance_store.set_store(None)
+    assert accepted["RollNo"].tolist() == ["103"]
+    assert rejected["Reason"].tolist() == ["Already marked", "Already marked"]
+    assert store.mark("103", "2026-01-05", "Present") is False
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_rollup_filters_by_student_and_month(tmp_path, backend):
+    if backend == "csv":
+        store = CsvAttendanceStore(str(tmp_path / "a.csv"), str(tmp_path / "archive"))
+    else:
+        store = attendance_store.SqliteAttendanceStore(str(tmp_path / "a.db"), migrate_from=None)
+    store.init()
+    for roll, day, status in [
+        ("101", "2026-01-05", "Present"), ("101", "2026-01-06", "Absent"),
+        ("101", "2026-02-02", "Present"), ("102", "2026-01-05", "Absent"),
+    ]:
+        store.mark(roll, day, status)
+
+    def rows(**filters):
+        return sorted(store.rollup(**filters).itertuples(index=False, name=None))
+
+    assert rows(roll="101") == [("101", "2026-01", 1, 1), ("101", "2026-02", 1, 0)]
+    assert rows(month="2026-01") == [("101", "2026-01", 1, 1), ("102", "2026-01", 0, 1)]
+    assert rows(roll="102", month="2026-02") == []
+    assert len(rows()) == 3
+
+
+def test_bulk_dates_are_parsed_per_row_in_key_format(tmp_path):
+    store = CsvAttendanceStore(str(tmp_path / "a.csv"), str(tmp_path / "archive"))
+    store.init()
+    attendance_store.set_store(store)
+    try:
+        accepted, rejected = attendance_store.mark_attendance_bulk([
+            ("102", "16/12/2025", "Present"),
+            ("102", "2025-12-18 ", "Present"),
+            # An invalid row does not make the valid one after it a repeat
+            ("103", "2025-12-18", "Late"),
+            ("103", "2025-12-18", "Absent"),
+            ("103", "2025-12-18", "Present"),
+        ])
+    finally:
+        attendance_store.set_store(None)
+    assert list(accepted.itertuples(index=False, name=None)) == [
+        ("102", "2025-12-18", "Present"), ("103", "2025-12-18", "Absent"),
+    ]
+    assert rejected["Reason"].tolist() == ["Invalid date", "Invalid status", "Repeated in upload"]
+
+
+def test_init_store_runs_once_per_store(tmp_path, monkeypatch):
+    store = attendance_store.SqliteAttendanceStore(str(tmp_path / "a.db"), migrate_from=None)
+    calls = []
+    init = store.init
+    monkeypatch.setattr(store, "init", lambda: calls.append(1) or init())
+    attendance_store.set_store(store)
+    try:
+        for _ in range(3):
+            attendance_store.init_store()
+        assert len(calls) == 1
+
+        other = attendance_store.SqliteAttendanceStore(str(tmp_path / "b.db"), migrate_from=None)
+        attendance_store.set_store(other)
+        attendance_store.init_store()
+        assert os.path.exists(other.path)
+    finally:
+        attendance_store.set_store(None)
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import types
+
+import pytest
+
+import downloader
+from downloader import FINISHED, DownloadQueue, build_options
+
+
+class StubYoutubeDL:
+    """Sends the hook payloads yt-dlp sends for an mp3 download.
+
+    The returned info carries no file path, so the manifest entry can only
+    have come from the hooks.
+    """
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def filename(self, vid, ext):
+        return (self.opts["outtmpl"].replace("%(title)s", "Some_Song")
+                .replace("%(id)s", vid).replace("%(ext)s", ext))
+
+    def extract_info(self, url, download=True):
+        vid = downloader.video_id(url)
+        raw, final = self.filename(vid, "webm"), self.filename(vid, "mp3")
+        with open(raw, "wb") as f:
+            f.write(f"raw audio {vid}".encode())
+        for hook in self.opts["progress_hooks"]:
+            hook({"status": "downloading", "filename": raw,
+                  "downloaded_bytes": 4, "total_bytes": 9})
+            hook({"status": "finished", "filename": raw, "total_bytes": 9})
+
+        info = {"id": vid, "title": "Some Song", "filepath": raw}
+        os.replace(raw, final)
+        converted = dict(info, filepath=final)
+        for name in ("FFmpegExtractAudio", "MoveFilesAfterDownload"):
+            for hook in self.opts["postprocessor_hooks"]:
+                hook({"status": "started", "postprocessor": name, "info_dict": converted})
+                hook({"status": "finished", "postprocessor": name, "info_dict": converted})
+        return {"id": info["id"], "title": info["title"]}
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "yt_dlp", types.SimpleNamespace(YoutubeDL=StubYoutubeDL))
+    return DownloadQueue(
+        workers=1,
+        download_dir=str(tmp_path),
+        journal=str(tmp_path / "jobs.jsonl"),
+        cache=str(tmp_path / "cache.jsonl"),
+        manifest=str(tmp_path / "manifest.jsonl"),
+    )
+
+
+def wait_done(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_hooks_write_the_manifest_entry(queue, tmp_path, monkeypatch):
+    recorded_from = []
+    record = queue.manifest.record
+
+    def tracking_record(*args, **kwargs):
+        recorded_from.append(sys._getframe(1).f_code.co_name)
+        return record(*args, **kwargs)
+
+    monkeypatch.setattr(queue.manifest, "record", tracking_record)
+
+    job = wait_done(queue.submit("https://youtu.be/dQw4w9WgXcQ", "mp3 (audio only)",
+                                 build_options("mp3 (audio only)", str(tmp_path))))
+
+    assert job.status == FINISHED, job.error
+    assert recorded_from == ["_postprocessor_hook"]
+    entry = queue.manifest.get(job.id)
+    assert entry["path"] == str(tmp_path / "Some_Song [dQw4w9WgXcQ].mp3")
+    assert entry["size"] == len(b"raw audio dQw4w9WgXcQ")
+    assert entry["sha256"] == downloader.file_sha256(entry["path"])
+    assert entry["title"] == "Some Song"
+
+
+def test_falls_back_to_the_last_hooked_path(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, "FINAL_POSTPROCESSOR", "NeverSent")
+    job = wait_done(queue.submit("https://youtu.be/dQw4w9WgXcQ", "mp3 (audio only)",
+                                 build_options("mp3 (audio only)", str(tmp_path))))
+    # Falls back to the last path the hooks saw, which still exists
+    assert job.status == FINISHED
+    assert queue.manifest.get(job.id)["name"] == "Some_Song [dQw4w9WgXcQ].mp3"
+
+
+def download(queue, tmp_path, vid):
+    choice = "mp3 (audio only)"
+    return wait_done(queue.submit(f"https://youtu.be/{vid}", choice,
+                                  build_options(choice, str(tmp_path))))
+
+
+def test_videos_with_the_same_title_keep_their_own_files(queue, tmp_path):
+    first = download(queue, tmp_path, "aaaaaaaaaaa")
+    second = download(queue, tmp_path, "bbbbbbbbbbb")
+    assert first.path != second.path
+
+    again = download(queue, tmp_path, "aaaaaaaaaaa")
+    assert again.cached
+    assert again.path == first.path
+    with open(again.path, "rb") as f:
+        assert f.read() == b"raw audio aaaaaaaaaaa"
+
+
+def test_cache_misses_when_the_file_changed(queue, tmp_path):
+    first = download(queue, tmp_path, "aaaaaaaaaaa")
+
+    # Same size, other content, recorded by another job
+    with open(first.path, "wb") as f:
+        f.write(b"raw audio zzzzzzzzzzz")
+    queue.manifest.record("other-job", first.path)
+    assert not download(queue, tmp_path, "aaaaaaaaaaa").cached
+
+    # Other size
+    with open(first.path, "wb") as f:
+        f.write(b"truncated")
+    assert not download(queue, tmp_path, "aaaaaaaaaaa").cached
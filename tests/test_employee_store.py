@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from employee_store import INT32_MAX, EmployeeSearchIndex, EmployeeStore, apply_employee_schema
+
+
+def employee(emp_id, salary):
+    return pd.DataFrame({
+        "Employee ID": [emp_id],
+        "Name": ["Kiran Rao"],
+        "Department": ["IT"],
+        "Role": ["Data Engineer"],
+        "Salary": [salary],
+        "Date Joined": ["2024-02-01"],
+    })
+
+
+@pytest.mark.parametrize("emp_id, salary", [
+    (3_000_000_000, 50_000),
+    (2001, 5_000_000_000),
+    (2001, -1),
+])
+def test_add_rejects_values_outside_int32(tmp_path, emp_id, salary):
+    store = EmployeeStore(str(tmp_path / "employees.csv"))
+    before = store.snapshot()
+    with pytest.raises(ValueError):
+        store.add(employee(emp_id, salary))
+    assert store.snapshot() is before
+    assert len(pd.read_csv(tmp_path / "employees.csv")) == len(before.employees)
+
+
+def test_add_accepts_int32_max(tmp_path):
+    store = EmployeeStore(str(tmp_path / "employees.csv"))
+    snapshot = store.add(employee(INT32_MAX, INT32_MAX))
+    assert snapshot.employees["Employee ID"].iloc[-1] == INT32_MAX
+    assert snapshot.employees["Salary"].iloc[-1] == INT32_MAX
+
+
+def staff(*rows):
+    return pd.DataFrame(rows, columns=["Name", "Department", "Role"])
+
+
+def test_search_matches_substrings_across_adds():
+    index = EmployeeSearchIndex()
+    index.add(staff(("Ravi Kumar", "IT", "QA Engineer"), ("Anita Rao", "HR", "Recruiter")))
+    index.add(staff(("Kumar Vikram", "IT", "Data Engineer"), ("Vikram Das", "Sales", "Lead")))
+
+    assert list(index.search("engineer", 4)) == [0, 2]
+    assert list(index.search("vikram", 4)) == [2, 3]
+    # Rows past the snapshot size are ignored
+    assert list(index.search("vikram", 3)) == [2]
+    assert list(index.search("hr", 4)) == [1]
+    assert list(index.search("nobody", 4)) == []
+    # A match may not span two fields
+    assert list(index.search("raoh", 4)) == []
+
+
+def test_search_rank_puts_name_prefix_then_word_prefix_first():
+    index = EmployeeSearchIndex()
+    index.add(staff(
+        ("Anil Sharma", "IT", "Shipping Clerk"),
+        ("Asha Menon", "HR", "Recruiter"),
+        ("Ravi Kumar", "Sales", "Asha Team Lead"),
+        ("Sharma Ashan", "IT", "Tester"),
+    ))
+
+    assert list(index.search("asha", 4)) == [1, 2, 3]
+    assert list(index.search("asha", 4, rank=True)) == [1, 2, 3]
+    assert list(index.search("sha", 4, rank=True)) == [3, 0, 1, 2]
+
+
+def test_schema_stores_dates_in_nanoseconds():
+    typed = apply_employee_schema(employee(2001, 50_000))
+    assert typed["Date Joined"].dtype == "datetime64[ns]"
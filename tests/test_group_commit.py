@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from attendance_store import GroupCommitWriter, WriteQueueFull
+
+
+class BlockingCommit:
+    """Commit function that holds each batch until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def __call__(self, entries):
+        self.batches.append(list(entries))
+        self.started.set()
+        self.release.wait(5)
+        return [True] * len(entries)
+
+
+def test_timed_out_submission_is_never_committed():
+    commit = BlockingCommit()
+    writer = GroupCommitWriter(commit)
+    first = []
+    thread = threading.Thread(target=lambda: first.append(writer.submit("a")))
+    thread.start()
+    assert commit.started.wait(5)
+
+    # The writer is busy with "a", so "b" waits in the queue and times out
+    with pytest.raises(WriteQueueFull):
+        writer.submit("b", timeout=0.05)
+    commit.release.set()
+    thread.join(5)
+    assert first == [True]
+    assert writer.submit("c") is True
+    assert commit.batches == [["a"], ["c"]]
+
+
+def test_claimed_submission_waits_for_its_commit():
+    commit = BlockingCommit()
+    writer = GroupCommitWriter(commit)
+    threading.Timer(0.2, commit.release.set).start()
+    # Times out while its own batch is being written, then gets the result
+    assert writer.submit("a", timeout=0.05) is True
+    assert commit.batches == [["a"]]
@@ -0,0 +1,38 @@
+import sqlite3
+
+import roster
+from roster import RosterStore, hash_password, write_roster
+
+
+def test_faculty_logins_are_hashed_and_checked_by_role(tmp_path):
+    path = tmp_path / "roster.csv"
+    write_roster(str(path), {"101": "city101"}, {"hod": "s3cret"}, iterations=1_000)
+    text = path.read_text()
+    assert "s3cret" not in text and "city101" not in text
+
+    store = RosterStore(str(path))
+    assert store.verify("hod", "s3cret", role=roster.FACULTY)
+    assert not store.verify("hod", "wrong", role=roster.FACULTY)
+    # A student cannot log in as faculty, nor faculty as a student
+    assert not store.verify("101", "city101", role=roster.FACULTY)
+    assert not store.verify("hod", "s3cret")
+    assert store.verify("101", "city101")
+
+
+def test_roster_without_role_column_has_no_faculty(tmp_path):
+    path = tmp_path / "roster.csv"
+    path.write_text(f"RollNo,PasswordHash\n101,{hash_password('city101', iterations=1_000)}\n")
+    store = RosterStore(str(path))
+    assert store.verify("101", "city101")
+    assert not store.verify("faculty", "cityfaculty", role=roster.FACULTY)
+
+
+def test_sqlite_faculty_table(tmp_path):
+    path = tmp_path / "roster.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE students (RollNo TEXT, PasswordHash TEXT)")
+    conn.execute("CREATE TABLE faculty (Username TEXT, PasswordHash TEXT)")
+    conn.execute("INSERT INTO faculty VALUES ('hod', ?)", (hash_password("s3cret", iterations=1_000),))
+    conn.commit()
+    conn.close()
+    assert RosterStore(str(path)).verify("hod", "s3cret", role=roster.FACULTY)
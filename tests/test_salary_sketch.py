@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from employee_store import SEED_EMPLOYEES, apply_employee_schema
+from salary_sketch import SKETCH_ACCURACY, SalaryDistribution, exact_quantiles
+
+
+def within_accuracy(sketched, exact):
+    return np.all(np.abs(sketched - exact) <= SKETCH_ACCURACY * np.abs(exact) + 1)
+
+
+def test_seed_percentiles_match_exact_within_accuracy():
+    employees = apply_employee_schema(pd.DataFrame(SEED_EMPLOYEES))
+    sketched = SalaryDistribution.from_frame(employees).quantiles()
+    exact = exact_quantiles(employees)
+    assert list(sketched.index) == list(exact.index)
+    assert within_accuracy(sketched.to_numpy(), exact.to_numpy())
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_percentiles_match_exact_within_accuracy(seed):
+    rng = np.random.default_rng(seed)
+    n = 5_000
+    employees = apply_employee_schema(pd.DataFrame({
+        "Employee ID": np.arange(n) + 1000,
+        "Name": ["x"] * n,
+        "Department": rng.choice(["IT", "HR", "Finance"], n),
+        "Role": ["Engineer"] * n,
+        "Salary": rng.integers(20_000, 400_000, n),
+        "Date Joined": ["2024-01-01"] * n,
+    }))
+    sketched = SalaryDistribution.from_frame(employees).quantiles()
+    exact = exact_quantiles(employees)
+    assert within_accuracy(sketched.to_numpy(), exact.to_numpy())